@@ -0,0 +1,41 @@
+# manager_agentとcode_agentで共有する、生成コード内でimportを許可するモジュール
+AUTHORIZED_IMPORTS = (
+    "requests",
+    "zipfile",
+    "os",
+    "pandas",
+    "numpy",
+    "sympy",
+    "json",
+    "bs4",
+    "pubchempy",
+    "xml",
+    "yahoo_finance",
+    "Bio",
+    "sklearn",
+    "scipy",
+    "pydub",
+    "io",
+    "PIL",
+    "chess",
+    "PyPDF2",
+    "pptx",
+    "torch",
+    "datetime",
+    "fractions",
+    "csv",
+    "matplotlib",
+    "seaborn",
+    "plotly",
+)
+
+# smolagentsのadditional_authorized_importsは許可リストとして使われるだけで、事前にimportはされない
+# （torch等の重いモジュールは生成コードが実際にimportした時点で初めて読み込まれる）
+# --minimal-imports指定時に使う、デバッグ用の最小限の許可リスト
+MINIMAL_AUTHORIZED_IMPORTS = (
+    "os",
+    "json",
+    "requests",
+    "numpy",
+    "pandas",
+)
@@ -1,47 +1,31 @@
+from typing import Optional, Sequence
+
 from smolagents import (
     CodeAgent,
     Model
 )
 
 # from scripts.text_inspector_tool import TextInspectorTool
-from scripts.file_editor import FileEditorTool
-from scripts.bash_tool import BashTool
+from scripts.file_editor import get_default_file_editor_tool
+from scripts.bash_tool import BashTool, get_default_bash_tool
+from scripts.tool_cache import ToolCallCache
+
+from agents._constants import AUTHORIZED_IMPORTS
 
-AUTHORIZED_IMPORTS = [
-    "requests",
-    "zipfile",
-    "os",
-    "pandas",
-    "numpy",
-    "sympy",
-    "json",
-    "bs4",
-    "pubchempy",
-    "xml",
-    "yahoo_finance",
-    "Bio",
-    "sklearn",
-    "scipy",
-    "pydub",
-    "io",
-    "PIL",
-    "chess",
-    "PyPDF2",
-    "pptx",
-    "torch",
-    "datetime",
-    "fractions",
-    "csv",
-    "matplotlib",
-    "seaborn",
-    "plotly",
-]
 
-def create_code_agent(model: Model):
+def create_code_agent(
+    model: Model,
+    tool_cache: Optional[ToolCallCache] = None,
+    shared_shell: bool = True,
+    authorized_imports: Sequence[str] = AUTHORIZED_IMPORTS,
+):
     # ツールの設定
+    # tool_cacheを渡すと、読み取り専用のコマンドの結果を他のエージェントと共有してキャッシュする
+    # shared_shell=Trueの場合、他のエージェントと同じbashセッション（カレントディレクトリや環境変数）を共有する
+    # authorized_importsは生成コード内でimportを許可するモジュール
     code_tools = [
-        FileEditorTool(),
-        BashTool(),
+        get_default_file_editor_tool(shared_cache=tool_cache),
+        get_default_bash_tool(shared_cache=tool_cache) if shared_shell else BashTool(shared_cache=tool_cache),
     ]
 
     # code agentの作成
@@ -50,7 +34,7 @@ def create_code_agent(model: Model):
         tools=code_tools,
         max_steps=20,
         verbosity_level=2,
-        additional_authorized_imports=AUTHORIZED_IMPORTS,
+        additional_authorized_imports=authorized_imports,
         planning_interval=4,
         name="code_agent",
         description="""A team member specialized in software engineering tasks.
@@ -69,6 +53,9 @@ def create_code_agent(model: Model):
         provide_run_summary=True,
     )
     
+    # 計算処理を行うエージェントとして、並列委任時はプロセスで実行できるようにする
+    code_agent.agent_kind = "cpu"
+
     code_agent.prompt_templates["managed_agent"]["task"] += """If you need more information about the code or requirements to complete the task, you can use `final_answer` with your request for clarification as argument to ask for more details.
     When analyzing code, consider best practices, potential bugs, and optimization opportunities.
     You can suggest refactoring when appropriate and explain the benefits of your proposed changes."""
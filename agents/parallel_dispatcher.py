@@ -0,0 +1,140 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from enum import Enum
+from typing import Any, Callable, Dict, List, Literal, Optional
+
+from smolagents import Tool
+
+# 管理下のエージェントの処理の種類
+# "io": 検索やブラウザ操作など待ち時間が中心のエージェント（スレッドで並列実行）
+# "cpu": numpy等の計算を行うエージェント（GILの影響を受けないようプロセスで並列実行）
+AgentKind = Literal["io", "cpu"]
+
+
+def _run_agent_in_process(agent_factory: Callable, model_params: Dict[str, Any], task: str) -> str:
+    # ワーカープロセス内で実行される。LiteLLMModelやエージェントはpickleできないため、
+    # 設定だけを受け取ってモデルとエージェントを作り直す
+    from scripts.prompt_cache_model import PromptCachingLiteLLMModel
+
+    agent = agent_factory(PromptCachingLiteLLMModel(**model_params))
+    return str(agent(task))
+
+
+class OrchestrationPattern(str, Enum):
+    """How the manager agent delegates subtasks to its managed agents."""
+
+    SEQUENTIAL = "sequential"
+    PARALLEL = "parallel"
+
+
+class ParallelManagedAgentDispatcher(Tool):
+    """Tool that fans independent subtasks out to managed agents concurrently."""
+
+    name = "delegate_in_parallel"
+    description = """Delegate several independent tasks to your managed agents at once and wait for all of them to finish.
+Use this instead of calling the agents one after another when the tasks do not depend on each other's results, e.g. searching several sources at the same time, or searching while the code agent works on a file.
+Each item of `tasks` must be a dict like {"agent": "search_agent", "task": "Find me ..."}. The results are returned in the same order as `tasks`."""
+    # 日本語訳：
+    # 複数の独立したタスクを管理下のエージェントに一度に委任し、すべての完了を待ちます。
+    # タスクが互いの結果に依存しない場合（複数のソースを同時に検索する、code agentの作業中に検索する等）は、
+    # エージェントを順番に呼び出す代わりにこのツールを使用してください。
+    # `tasks`の各要素は {"agent": "search_agent", "task": "Find me ..."} のような辞書である必要があります。
+    # 結果は`tasks`と同じ順序で返されます。
+
+    inputs = {
+        "tasks": {
+            "description": 'List of {"agent": <managed agent name>, "task": <full sentence task>} dicts to run concurrently.',
+            "type": "array",
+        },
+    }
+    output_type = "string"
+
+    def __init__(
+        self,
+        managed_agents: List,
+        answer_lock: Optional[threading.Lock] = None,
+        process_agent_factories: Optional[Dict[str, Callable]] = None,
+        model_params: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        Args:
+            managed_agents: The agents tasks can be delegated to.
+            answer_lock: Lock held while collecting the results.
+            process_agent_factories: For agents whose `agent_kind` is "cpu", a picklable
+                `factory(model) -> agent` used to recreate them in a worker process.
+            model_params: Picklable keyword arguments to recreate the model in the worker process.
+        """
+        super().__init__()
+        self.managed_agents = {agent.name: agent for agent in managed_agents}
+        self.answer_lock = answer_lock or threading.Lock()
+        self.process_agent_factories = process_agent_factories or {}
+        self.model_params = model_params
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+
+    def _runs_in_process(self, agent_name: str) -> bool:
+        agent = self.managed_agents[agent_name]
+        return (
+            getattr(agent, "agent_kind", "io") == "cpu"
+            and agent_name in self.process_agent_factories
+            and self.model_params is not None
+        )
+
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        # ワーカーの起動コストを毎回払わないよう、プロセスプールは初回使用時に作成して使い回す
+        if self._process_pool is None:
+            # forkだとスレッド実行中の親からロックや共有httpxクライアントの接続（litellm.client_session）を
+            # 引き継いでしまうため、spawnで新しいインタプリタとして起動する
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._process_pool
+
+    def forward(self, tasks: list) -> str:
+        if not tasks:
+            raise Exception("no tasks provided.")
+        for task in tasks:
+            if not isinstance(task, dict) or "agent" not in task or "task" not in task:
+                raise Exception(f'Each task must be a dict with "agent" and "task" keys, got: {task!r}')
+            if task["agent"] not in self.managed_agents:
+                raise Exception(
+                    f"Unknown agent {task['agent']!r}. Available agents: {', '.join(self.managed_agents)}"
+                )
+
+        # 同じエージェントのインスタンスはメモリを共有するため、エージェントごとのタスクは順番に実行し、
+        # 異なるエージェント間でのみ並列化する
+        batches: Dict[str, List[int]] = {}
+        for i, task in enumerate(tasks):
+            batches.setdefault(task["agent"], []).append(i)
+
+        results: List[Optional[str]] = [None] * len(tasks)
+
+        def run_batch(agent_name: str, indices: List[int]) -> None:
+            agent = self.managed_agents[agent_name]
+            in_process = self._runs_in_process(agent_name)
+            for i in indices:
+                try:
+                    if in_process:
+                        output = self._get_process_pool().submit(
+                            _run_agent_in_process,
+                            self.process_agent_factories[agent_name],
+                            self.model_params,
+                            tasks[i]["task"],
+                        ).result()
+                    else:
+                        output = str(agent(tasks[i]["task"]))
+                except Exception as e:
+                    output = f"Error: {agent_name} failed with {e}"
+                with self.answer_lock:
+                    results[i] = output
+
+        with ThreadPoolExecutor(max_workers=len(batches)) as pool:
+            futures = [pool.submit(run_batch, name, indices) for name, indices in batches.items()]
+            for future in futures:
+                future.result()
+
+        with self.answer_lock:
+            return "\n\n".join(
+                f"### Result {i + 1} from {tasks[i]['agent']}\n{result}" for i, result in enumerate(results)
+            )
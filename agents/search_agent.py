@@ -1,9 +1,13 @@
+from typing import Optional
+
 from scripts.text_inspector_tool import TextInspectorTool
 from scripts.browser_use_tool import (
     BrowserManager,
     BrowserNavigationTool,
+    BrowserNavigateManyTool,
     BrowserClickTool,
     BrowserInputTextTool,
+    BrowserClickAndReadTool,
     BrowserGetHtmlTool,
     BrowserGetTextTool,
     BrowserScrollTool,
@@ -13,9 +17,12 @@ from scripts.browser_use_tool import (
     BrowserNewTabTool,
     BrowserCloseTabTool,
     BrowserRefreshTool,
+    BrowserExpandToolsTool,
 )
-from scripts.file_editor import FileEditorTool
-from scripts.bash_tool import BashTool
+from scripts.browser_chain_tool import BrowserChainTool
+from scripts.file_editor import get_default_file_editor_tool
+from scripts.bash_tool import BashTool, get_default_bash_tool
+from scripts.tool_cache import ToolCallCache
 
 from smolagents import (
     # CodeAgent,
@@ -26,26 +33,60 @@ from smolagents import (
     Model
 )
 
-def create_search_agent(model: Model, text_limit: int = 100000):
+# 常に公開するブラウザツール（複数の操作をまとめて行う場合はbrowser_chainを使う）
+_CORE_BROWSER_TOOLS = (
+    BrowserNavigationTool,
+    BrowserNavigateManyTool,
+    BrowserClickTool,
+    BrowserInputTextTool,
+    BrowserChainTool,
+    BrowserGetTextTool,
+    BrowserScrollTool,
+    BrowserScreenshotTool,
+)
+# 使用頻度の低いブラウザツール。毎ステップのプロンプトに含まれるツール定義を減らすため、
+# expand_tools=Falseの場合はbrowser_expand_toolsで必要になった時点で追加する
+_EXTENDED_BROWSER_TOOLS = (
+    BrowserClickAndReadTool,
+    BrowserGetHtmlTool,
+    BrowserExecuteJsTool,
+    BrowserSwitchTabTool,
+    BrowserNewTabTool,
+    BrowserCloseTabTool,
+    BrowserRefreshTool,
+)
+
+
+def create_search_agent(
+    model: Model,
+    text_limit: int = 100000,
+    browser_manager: Optional[BrowserManager] = None,
+    tool_cache: Optional[ToolCallCache] = None,
+    shared_shell: bool = True,
+    expand_tools: bool = False,
+):
     # ブラウザマネージャーとツールの設定
-    browser_manager = BrowserManager(headless=False)
+    # 同じブラウザを使い回すため、BrowserManagerは毎回作成せずに共有する
+    if browser_manager is None:
+        browser_manager = BrowserManager.shared(headless=False)
+    # ブラウザの事前起動は行わず、最初のツール呼び出しで起動する
+    # （この時点ではイベントループが動いておらず、バックグラウンドで起動を進められないため）
+    # expand_tools=Trueの場合は最初からすべてのブラウザツールを公開する
+    extended_tools = [tool_cls(browser_manager) for tool_cls in _EXTENDED_BROWSER_TOOLS]
+    expand_tools_tool = None
     browser_tools = [
         GoogleSearchTool(provider="serper"),
-        BrowserNavigationTool(browser_manager),
-        BrowserClickTool(browser_manager),
-        BrowserInputTextTool(browser_manager),
-        BrowserGetHtmlTool(browser_manager),
-        BrowserGetTextTool(browser_manager),
-        BrowserScrollTool(browser_manager),
-        BrowserExecuteJsTool(browser_manager),
-        BrowserScreenshotTool(browser_manager),
-        BrowserSwitchTabTool(browser_manager),
-        BrowserNewTabTool(browser_manager),
-        BrowserCloseTabTool(browser_manager),
-        BrowserRefreshTool(browser_manager),
+        *(tool_cls(browser_manager) for tool_cls in _CORE_BROWSER_TOOLS),
+    ]
+    if expand_tools:
+        browser_tools += extended_tools
+    else:
+        expand_tools_tool = BrowserExpandToolsTool(extended_tools)
+        browser_tools.append(expand_tools_tool)
+    browser_tools += [
         TextInspectorTool(model, text_limit=text_limit),
-        FileEditorTool(),
-        BashTool(),
+        get_default_file_editor_tool(shared_cache=tool_cache),
+        get_default_bash_tool(shared_cache=tool_cache) if shared_shell else BashTool(shared_cache=tool_cache),
     ]
 
     # search agentの作成
@@ -69,6 +110,22 @@ def create_search_agent(model: Model, text_limit: int = 100000):
         # 検索キーワードではなく、「この情報を探して(...)」のような自然な文章で依頼してください。
         provide_run_summary=True,
     )
+    if expand_tools_tool is not None:
+        # browser_expand_toolsが呼ばれたときに、このエージェントのツールへ追加する
+        expand_tools_tool.agent_tools = search_agent.tools
+    # 前回の実行で返したページ本文・スクリーンショットは新しい実行の履歴には含まれないため、
+    # 実行の開始時に各ツールの「前回と同じ」判定をリセットする
+    observing_tools = [tool for tool in browser_tools if hasattr(tool, "reset_observation")]
+    run = search_agent.run
+
+    def run_with_fresh_observations(*args, **kwargs):
+        for tool in observing_tools:
+            tool.reset_observation()
+        return run(*args, **kwargs)
+
+    search_agent.run = run_with_fresh_observations
+    # 待ち時間が中心のエージェントとして、並列委任時はスレッドで実行する
+    search_agent.agent_kind = "io"
     search_agent.prompt_templates["managed_agent"]["task"] += """You can navigate to .txt online files.
     If a non-html page is in another format, especially .pdf or a Youtube video, use tool 'inspect_file_as_text' to inspect it.
     Additionally, if after some searching you find out that you need more information to answer the question, you can use `final_answer` with your request for clarification as argument to request for more information."""
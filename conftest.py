@@ -0,0 +1 @@
+# puts the repository root on sys.path, so that plain `pytest` can import `scripts` and `agents`
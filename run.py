@@ -2,88 +2,35 @@
 # reference: https://github.com/huggingface/smolagents/blob/main/examples/open_deep_research/run.py
 
 import argparse
+import atexit
+import functools
+import importlib.util
 import os
 import threading
 
+import httpx
+import litellm
 from dotenv import load_dotenv
 from huggingface_hub import login
 from scripts.text_inspector_tool import TextInspectorTool
-from scripts.browser_use_tool import (
-    BrowserManager,
-    BrowserNavigationTool,
-    BrowserClickTool,
-    BrowserInputTextTool,
-    BrowserGetHtmlTool,
-    BrowserGetTextTool,
-    BrowserScrollTool,
-    BrowserExecuteJsTool,
-    BrowserScreenshotTool,
-    BrowserSwitchTabTool,
-    BrowserNewTabTool,
-    BrowserCloseTabTool,
-    BrowserRefreshTool,
-)
+from scripts.browser_use_tool import BrowserManager
 from scripts.visual_qa import visualizer
+from agents._constants import AUTHORIZED_IMPORTS, MINIMAL_AUTHORIZED_IMPORTS
 from agents.search_agent import create_search_agent
 from agents.code_agent import create_code_agent
+from agents.parallel_dispatcher import OrchestrationPattern, ParallelManagedAgentDispatcher
+from scripts.persistent_cache import PersistentToolCache
+from scripts.plan_cache import PlanCache
+from scripts.prompt_cache_model import PromptCachingLiteLLMModel
 from smolagents import (
     CodeAgent,
     # GoogleSearchTool,  # 削除
     # HfApiModel,
-    LiteLLMModel,
+    # LiteLLMModel,  # PromptCachingLiteLLMModelを使用
     # ToolCallingAgent,  # 削除
     UserInputTool
 )
 
-# 1. まずBrowserManagerインスタンスを作成
-browser_manager = BrowserManager(headless=False)
-
-# 2. 全てのブラウザツールを作成
-BROWSER_TOOLS = [
-    BrowserNavigationTool(browser_manager),  # VisitToolの代替
-    BrowserClickTool(browser_manager),
-    BrowserInputTextTool(browser_manager),
-    BrowserGetHtmlTool(browser_manager),
-    BrowserGetTextTool(browser_manager),
-    BrowserScrollTool(browser_manager),      # PageUpTool, PageDownToolの代替
-    BrowserExecuteJsTool(browser_manager),
-    BrowserScreenshotTool(browser_manager),
-    BrowserSwitchTabTool(browser_manager),
-    BrowserNewTabTool(browser_manager),
-    BrowserCloseTabTool(browser_manager),
-    BrowserRefreshTool(browser_manager),
-]
-
-
-AUTHORIZED_IMPORTS = [
-    "requests",
-    "zipfile",
-    "os",
-    "pandas",
-    "numpy",
-    "sympy",
-    "json",
-    "bs4",
-    "pubchempy",
-    "xml",
-    "yahoo_finance",
-    "Bio",
-    "sklearn",
-    "scipy",
-    "pydub",
-    "io",
-    "PIL",
-    "chess",
-    "PyPDF2",
-    "pptx",
-    "torch",
-    "datetime",
-    "fractions",
-    "csv",
-    "matplotlib",
-    "seaborn",
-    "plotly",
-]
 load_dotenv(override=True)
 login(os.getenv("HF_TOKEN"))
 
@@ -96,6 +43,28 @@ def parse_args():
         "question", type=str, help="for example: 'How many studio albums did Mercedes Sosa release before 2007?'"
     )
     parser.add_argument("--model-id", type=str, default="o1")
+    parser.add_argument(
+        "--pattern",
+        type=OrchestrationPattern,
+        choices=list(OrchestrationPattern),
+        default=OrchestrationPattern.PARALLEL,
+        help="How the manager delegates to its managed agents. 'parallel' lets it run independent subtasks concurrently.",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Cache the results of read-only bash / file_editor calls on disk and reuse them across runs (for a few minutes).",
+    )
+    parser.add_argument(
+        "--no-plan-cache",
+        action="store_true",
+        help="Do not reuse or store the manager's plans for similar questions.",
+    )
+    parser.add_argument(
+        "--minimal-imports",
+        action="store_true",
+        help="Only authorize a few lightweight imports (os, json, requests, numpy, pandas) in generated code, for quick debugging.",
+    )
     return parser.parse_args()
 
 
@@ -116,7 +85,23 @@ BROWSER_CONFIG = {
 os.makedirs(f"./{BROWSER_CONFIG['downloads_folder']}", exist_ok=True)
 
 
-def create_agent(model_id="o3-mini"):
+@functools.lru_cache(maxsize=1)
+def create_http_client():
+    # LLM呼び出しごとにTCP/TLS接続を張り直さないよう、全エージェントで1つのhttpxクライアントを共有する
+    # create_agentを複数回呼んでもクライアント（とatexitの登録）はプロセス内で1つだけ作成する
+    # HTTP/2はh2パッケージがインストールされている場合のみ有効にする
+    client = httpx.Client(
+        http2=importlib.util.find_spec("h2") is not None,
+        limits=httpx.Limits(max_connections=32, max_keepalive_connections=32),
+        timeout=httpx.Timeout(60.0),
+    )
+    atexit.register(client.close)
+    return client
+
+
+def create_agent(
+    model_id="o3-mini", pattern=OrchestrationPattern.PARALLEL, use_tool_cache=False, minimal_imports=False
+):
     model_params = {
         "model_id": model_id,
         "custom_role_conversions": custom_role_conversions,
@@ -124,25 +109,64 @@ def create_agent(model_id="o3-mini"):
     }
     if model_id == "o3-mini":
         model_params["reasoning_effort"] = "high"
-    model = LiteLLMModel(**model_params)
+    # LiteLLMModelは同期のlitellm.completionを呼ぶため、共有クライアントはlitellm.client_sessionに設定する
+    http_client = create_http_client()
+    litellm.client_session = http_client
+    # システムプロンプトは全ステップで同一のため、プロバイダ側のプロンプトキャッシュを利用する
+    model = PromptCachingLiteLLMModel(**model_params)
 
     text_limit = 100000
+
+    # --cacheの場合、読み取り専用のbash / file_editorの結果を実行をまたいでディスクにキャッシュし、全エージェントで共有する
+    # 実行の間に外部でファイルが変更されると古い結果を返しうるため、既定では無効
+    tool_cache = PersistentToolCache() if use_tool_cache else None
+
+    # 生成コード内でimportを許可するモジュール（--minimal-importsの場合は最小限のみ）
+    authorized_imports = MINIMAL_AUTHORIZED_IMPORTS if minimal_imports else AUTHORIZED_IMPORTS
     
     # search_agentを取得
-    search_agent = create_search_agent(model)
+    # BrowserManagerはプロセス内で共有されるインスタンスを取得し、search_agentに渡す（create_agentを複数回呼んでもブラウザは1つ）
+    # 並列に委任する場合は同じbashセッションで同時にコマンドが実行されないよう、エージェントごとにシェルを分ける
+    shared_shell = pattern != OrchestrationPattern.PARALLEL
+    browser_manager = BrowserManager.shared(headless=False)
+    search_agent = create_search_agent(
+        model, browser_manager=browser_manager, tool_cache=tool_cache, shared_shell=shared_shell
+    )
 
     # code_agentを取得
-    code_agent = create_code_agent(model)
-    
+    code_agent = create_code_agent(
+        model, tool_cache=tool_cache, shared_shell=shared_shell, authorized_imports=authorized_imports
+    )
+
+    manager_tools = [visualizer, TextInspectorTool(model, text_limit), UserInputTool()]
+    if pattern == OrchestrationPattern.PARALLEL:
+        # 独立したサブタスクを管理下のエージェントへ並列に委任するためのツール
+        # code_agentの計算処理はGILの影響を受けないよう、別プロセスでエージェントを作り直して実行する
+        # （ワーカーではbashセッションやキャッシュを共有しない）
+        manager_tools.append(
+            ParallelManagedAgentDispatcher(
+                [search_agent, code_agent],
+                answer_lock=append_answer_lock,
+                process_agent_factories={
+                    "code_agent": functools.partial(
+                        create_code_agent, shared_shell=False, authorized_imports=authorized_imports
+                    ),
+                },
+                model_params=model_params,
+            )
+        )
+
     manager_agent = CodeAgent(
         model=model,
-        tools=[visualizer, TextInspectorTool(model, text_limit), UserInputTool()],
+        tools=manager_tools,
         max_steps=20,
         verbosity_level=2,
-        additional_authorized_imports=AUTHORIZED_IMPORTS,
+        additional_authorized_imports=authorized_imports,
         planning_interval=4,
         managed_agents=[search_agent, code_agent],
     )
+    # 共有クライアントはエージェントと同じ期間だけ生存させる
+    manager_agent._http_client = http_client
     
     # manager_agentのプロンプトを追加
     manager_agent.prompt_templates["system_prompt"] += """
@@ -165,15 +189,35 @@ def create_agent(model_id="o3-mini"):
     # 重要な制約：あなたは必ずユーザーの入力と同じ言語でプランの作成と出力を行わなくてはならない。
     # 例えば、ユーザーの質問が日本語の場合は、必ず計画も応答もすべて日本語で提供してください。
 
+    if pattern == OrchestrationPattern.PARALLEL:
+        manager_agent.prompt_templates["system_prompt"] += """
+    When several subtasks are independent of each other, delegate them in a single step with `delegate_in_parallel` instead of calling your managed agents one after another.
+    """
+        # 日本語訳：
+        # 複数のサブタスクが互いに独立している場合は、管理下のエージェントを順番に呼び出す代わりに、
+        # `delegate_in_parallel`を使って1ステップでまとめて委任してください。
+
     return manager_agent
 
 
 def main():
     args = parse_args()
 
-    agent = create_agent(model_id=args.model_id)
+    agent = create_agent(
+        model_id=args.model_id,
+        pattern=args.pattern,
+        use_tool_cache=args.cache,
+        minimal_imports=args.minimal_imports,
+    )
 
-    answer = agent.run(args.question)
+    if args.no_plan_cache:
+        answer = agent.run(args.question)
+    else:
+        # 意図が同じ質問（固有名詞や数値だけが異なる質問）の計画を再利用する
+        # 許可するimportが変わった場合は別のキャッシュエントリになる
+        plan_cache = PlanCache(config=agent.additional_authorized_imports)
+        answer = plan_cache.run(agent, args.question)
+        print(f"Plan cache: {plan_cache.stats()}")
 
     print(f"Got this answer: {answer}")
 
@@ -1,9 +1,18 @@
 import asyncio
+import codecs
+import contextlib
+import functools
 import os
-from typing import Optional
+import shutil
+import signal
+import statistics
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Optional
 
 from smolagents import Tool
 
+from .tool_cache import ToolCallCache, _changes_shell_state, _is_mutating, cache_if
+
 
 _BASH_DESCRIPTION = """Execute a bash command in the terminal.
 * Long running commands: For commands that may run indefinitely, it should be run in the background and the output should be redirected to a file, e.g. command = `python3 app.py > server.log 2>&1 &`.
@@ -18,6 +27,63 @@ _BASH_DESCRIPTION = """Execute a bash command in the terminal.
 # * タイムアウト: コマンド実行結果が「Command timed out. Sending SIGINT to the process」と表示された場合、アシスタントはコマンドをバックグラウンドで再実行する必要があります。
 # """
 
+_SENTINEL = "<<exit>>"
+# appended to every command so that both stdout and stderr end with a sentinel line
+_COMMAND_SUFFIX = f"; echo '{_SENTINEL}'; echo '{_SENTINEL}' 1>&2\n".encode()
+_SENTINEL_BYTES = f"{_SENTINEL}\n".encode()
+_READ_CHUNK_SIZE = 65536
+# makes SIGINT interrupt only the running command: a non-interactive bash would exit on it,
+# while with a trap it runs the trap and carries on with the next command (the sentinel)
+_SIGINT_TRAP = b"trap : INT\n"
+# seconds to wait for an interrupted command to print its sentinel, and between two interrupts
+_INTERRUPT_TIMEOUT = 5.0
+_INTERRUPT_INTERVAL = 0.5
+
+
+@functools.lru_cache(maxsize=1)
+def _resolve_shell_path() -> str:
+    """Locate bash once per process (cleared when the tool is restarted)."""
+    return shutil.which("bash") or "/bin/bash"
+
+
+@functools.lru_cache(maxsize=1)
+def _build_env() -> dict:
+    """Snapshot the environment for new bash sessions (cleared when the tool is restarted)."""
+    return dict(os.environ)
+
+
+# Environment variables that can change what a read-only command prints.
+_CACHE_ENV_KEYS = ("PATH", "HOME", "VIRTUAL_ENV", "LANG")
+
+
+def _bash_cache_key_parts(tool: "BashTool", command: str, restart: Optional[bool] = False) -> tuple:
+    # only sessions in their initial state are cached (see `_bash_session_changed`), so the
+    # directory they started in is their working directory
+    cwd = tool._session.start_cwd if tool._session is not None else os.getcwd()
+    return (cwd, {key: os.environ.get(key) for key in _CACHE_ENV_KEYS})
+
+
+def _bash_session_changed(tool: "BashTool", command: str, restart: Optional[bool] = False) -> bool:
+    """True once the tool's session has run a command that may have changed its directory or variables."""
+    return tool._session is not None and tool._session.state_changed
+
+
+def _partial_sentinel_length(buffer: bytearray) -> int:
+    """Length of the longest suffix of `buffer` that could be the start of the sentinel."""
+    for length in range(min(len(buffer), len(_SENTINEL_BYTES) - 1), 0, -1):
+        if buffer.endswith(_SENTINEL_BYTES[:length]):
+            return length
+    return 0
+
+
+class BashTimeoutError(Exception):
+    """Raised when a command does not finish in time, with whatever it printed so far."""
+
+    def __init__(self, message: str, partial_output: str = "", partial_error: str = ""):
+        super().__init__(message)
+        self.partial_output = partial_output
+        self.partial_error = partial_error
+
 
 class _BashSession:
     """A session of a bash shell."""
@@ -25,21 +91,30 @@ class _BashSession:
     _started: bool
     _process: asyncio.subprocess.Process
 
-    command: str = "/bin/bash"
-    _output_delay: float = 0.2  # seconds
+    command: Optional[str] = None  # defaults to the bash found on PATH
     _timeout: float = 120.0  # seconds
-    _sentinel: str = "<<exit>>"
 
     def __init__(self):
         self._started = False
+        # the shell starts in the current directory of this process
+        self.start_cwd = os.getcwd()
+        # True once a command may have changed the shell's directory, variables or options
+        self.state_changed = False
         self._timed_out = False
+        # True while a command's output has not been read up to its sentinel
+        self._busy = False
+        # bytes read past the sentinel, kept for the next command
+        self._leftover = {"output": b"", "error": b""}
+        # seconds between sending each command and seeing its sentinel (most recent commands only)
+        self.wait_times: Deque[float] = deque(maxlen=256)
 
     async def start(self):
         if self._started:
             return
 
         self._process = await asyncio.create_subprocess_shell(
-            self.command,
+            self.command or _resolve_shell_path(),
+            env=_build_env(),
             preexec_fn=os.setsid,
             shell=True,
             bufsize=0,
@@ -47,6 +122,8 @@ class _BashSession:
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
         )
+        # written ahead of the first command, so it needs no drain of its own
+        self._process.stdin.write(_SIGINT_TRAP)
 
         self._started = True
 
@@ -60,63 +137,171 @@ class _BashSession:
 
     async def run(self, command: str):
         """Execute a command in the bash shell."""
+        result = {}
+        async for event in self.run_stream(command):
+            if "delta" not in event:
+                result = event
+        return result
+
+    async def run_stream(self, command: str) -> AsyncIterator[dict]:
+        """Execute a command in the bash shell, yielding its output as it arrives.
+
+        Yields `{"delta": ..., "stream": "output" | "error"}` events, then a
+        final `{"output": ..., "error": ...}` event. If the command does not
+        finish in time, raises `BashTimeoutError` carrying the partial output.
+        """
         if not self._started:
             raise Exception("Session has not started.")
         if self._process.returncode is not None:
-            return {
+            yield {
                 "system": "tool must be restarted",
                 "error": f"bash has exited with returncode {self._process.returncode}",
             }
+            return
         if self._timed_out:
             raise Exception(
                 f"timed out: bash has not returned in {self._timeout} seconds and must be restarted",
             )
+        if self._busy:
+            raise Exception("the output of a previous command was not read to the end; the tool must be restarted")
 
         # we know these are not None because we created the process with PIPEs
         assert self._process.stdin
         assert self._process.stdout
         assert self._process.stderr
 
-        # send command to the process
-        self._process.stdin.write(
-            command.encode() + f"; echo '{self._sentinel}'\n".encode()
-        )
-        await self._process.stdin.drain()
+        if _changes_shell_state(command):
+            self.state_changed = True
 
-        # read output from the process, until the sentinel is found
+        # send command to the process. the sentinel is echoed to both streams so
+        # that each of them can be drained up to the end of this command's output.
+        self._busy = True
+        self._process.stdin.write(command.encode() + _COMMAND_SUFFIX)
+        await self._process.stdin.drain()
+        loop = asyncio.get_running_loop()
+        sent_at = loop.time()
+
+        queue: asyncio.Queue = asyncio.Queue()
+        pumps = [
+            asyncio.create_task(self._pump(self._process.stdout, "output", queue)),
+            asyncio.create_task(self._pump(self._process.stderr, "error", queue)),
+        ]
+        parts = {"output": [], "error": []}
+        finished = 0
+        completed = False
         try:
-            async with asyncio.timeout(self._timeout):
-                while True:
-                    await asyncio.sleep(self._output_delay)
-                    # if we read directly from stdout/stderr, it will wait forever for
-                    # EOF. use the StreamReader buffer directly instead.
-                    output = (
-                        self._process.stdout._buffer.decode()
-                    )  # pyright: ignore[reportAttributeAccessIssue]
-                    if self._sentinel in output:
-                        # strip the sentinel and break
-                        output = output[: output.index(self._sentinel)]
-                        break
-        except asyncio.TimeoutError:
-            self._timed_out = True
-            raise Exception(
-                f"timed out: bash has not returned in {self._timeout} seconds and must be restarted",
-            ) from None
-
+            # read output from the process, until the sentinel is found on both streams.
+            # the deadline is applied per read rather than around the loop, because the
+            # consumer runs between our yields and must not be cancelled by our timeout.
+            while finished < len(pumps):
+                remaining = sent_at + self._timeout - loop.time()
+                try:
+                    stream, delta = await asyncio.wait_for(queue.get(), max(remaining, 0))
+                except asyncio.TimeoutError:
+                    self._timed_out = True
+                    raise BashTimeoutError(
+                        f"timed out: bash has not returned in {self._timeout} seconds and must be restarted",
+                        partial_output="".join(parts["output"]),
+                        partial_error="".join(parts["error"]),
+                    ) from None
+                if delta is None:
+                    finished += 1
+                    continue
+                parts[stream].append(delta)
+                yield {"delta": delta, "stream": stream}
+            completed = True
+        finally:
+            if not completed and not self._timed_out:
+                # the consumer stopped reading early: interrupt the command so that the session
+                # can run the next one
+                await self._interrupt(queue, len(pumps) - finished)
+            # if the output could not be drained, the shell is still busy with this command
+            # and `_busy` stays set: its remaining output would otherwise be mistaken for the
+            # output of the next command
+            for pump in pumps:
+                pump.cancel()
+        self._busy = False
+        self.wait_times.append(loop.time() - sent_at)
+
+        output = "".join(parts["output"])
+        error = "".join(parts["error"])
         if output.endswith("\n"):
             output = output[:-1]
-
-        error = (
-            self._process.stderr._buffer.decode()
-        )  # pyright: ignore[reportAttributeAccessIssue]
         if error.endswith("\n"):
             error = error[:-1]
 
-        # clear the buffers so that the next output can be read correctly
-        self._process.stdout._buffer.clear()  # pyright: ignore[reportAttributeAccessIssue]
-        self._process.stderr._buffer.clear()  # pyright: ignore[reportAttributeAccessIssue]
-
-        return {"output": output, "error": error}
+        yield {"output": output, "error": error}
+
+    async def _interrupt(self, queue: asyncio.Queue, pending: int) -> None:
+        """Send SIGINT to the running command and discard its output up to the sentinel of each of the `pending` streams.
+
+        The signal is repeated until the sentinels arrive: one sent between two commands
+        of a list only runs the trap, and the next command would carry on.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + _INTERRUPT_TIMEOUT
+        while pending:
+            with contextlib.suppress(ProcessLookupError):
+                # the session leads its own process group (see `start`), which includes the command
+                os.killpg(self._process.pid, signal.SIGINT)
+            try:
+                while pending:
+                    _, delta = await asyncio.wait_for(queue.get(), _INTERRUPT_INTERVAL)
+                    if delta is None:
+                        pending -= 1
+            except asyncio.TimeoutError:
+                if loop.time() >= deadline:
+                    # e.g. a loop that survives the interrupts; the tool must be restarted
+                    return
+        self._busy = False
+
+    def wait_stats(self) -> Dict[str, float]:
+        """Summarize how long recent commands took to return, in seconds."""
+        if not self.wait_times:
+            return {"count": 0}
+        waits = sorted(self.wait_times)
+        return {
+            "count": len(waits),
+            "p50": statistics.median(waits),
+            "p95": waits[min(len(waits) - 1, int(len(waits) * 0.95))],
+            "max": waits[-1],
+        }
+
+    async def _pump(self, stream: asyncio.StreamReader, name: str, queue: asyncio.Queue):
+        """Forward decoded data from `stream` to `queue` up to the sentinel line, then put `(name, None)`.
+
+        A trailing partial sentinel is held back until more data arrives, so
+        that a sentinel split across two reads is never forwarded as output.
+        Forwarded bytes are dropped from the buffer, so each byte is searched
+        and decoded once and the total work stays linear in the output size.
+        """
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        buffer = bytearray(self._leftover[name])
+        self._leftover[name] = b""
+        try:
+            while True:
+                index = buffer.find(_SENTINEL_BYTES)
+                if index != -1:
+                    # data after the sentinel (e.g. from a background job) belongs to the next command
+                    self._leftover[name] = bytes(buffer[index + len(_SENTINEL_BYTES):])
+                    del buffer[index:]
+                    break
+                safe = len(buffer) - _partial_sentinel_length(buffer)
+                if safe > 0:
+                    text = decoder.decode(bytes(buffer[:safe]))
+                    del buffer[:safe]
+                    if text:
+                        queue.put_nowait((name, text))
+                chunk = await stream.read(_READ_CHUNK_SIZE)
+                if not chunk:
+                    # bash exited before printing the sentinel
+                    break
+                buffer += chunk
+            text = decoder.decode(bytes(buffer), final=True)
+            if text:
+                queue.put_nowait((name, text))
+        finally:
+            queue.put_nowait((name, None))
 
 
 class BashTool(Tool):
@@ -139,8 +324,26 @@ class BashTool(Tool):
 
     _session: Optional[_BashSession] = None
 
+    def __init__(self, use_cache: bool = False, shared_cache: Optional[ToolCallCache] = None):
+        """
+        Args:
+            use_cache: Cache the results of read-only commands (`ls`, `cat`, `git status`, ...).
+            shared_cache: A cache shared with other tool instances. Implies `use_cache`.
+        """
+        super().__init__()
+        self._cache = shared_cache if shared_cache is not None else (ToolCallCache() if use_cache else None)
+
+    @cache_if(
+        tool_name="bash",
+        cacheable=lambda command, restart=False: not restart and not _is_mutating(command),
+        key_parts=_bash_cache_key_parts,
+        bypass=_bash_session_changed,
+    )
     async def forward(self, command: str, restart: Optional[bool] = False) -> dict:
         if restart:
+            # pick up changes to PATH or the environment made since the last start
+            _resolve_shell_path.cache_clear()
+            _build_env.cache_clear()
             if self._session:
                 self._session.stop()
             self._session = _BashSession()
@@ -157,6 +360,51 @@ class BashTool(Tool):
 
         raise Exception("no command provided.")
 
+    async def forward_stream(self, command: str) -> AsyncIterator[dict]:
+        """Like `forward`, but yields the output incrementally (see `_BashSession.run_stream`).
+
+        Lets the caller react to early output of long running commands, e.g. stop
+        reading at the first failing test: closing the stream early interrupts the
+        command with SIGINT. Results are never cached, but a
+        mutating command invalidates the cache like it does through `forward`.
+        """
+        if not command:
+            raise Exception("no command provided.")
+        if self._session is None:
+            self._session = _BashSession()
+            await self._session.start()
+
+        stream = self._session.run_stream(command)
+        try:
+            async for event in stream:
+                yield event
+        finally:
+            # close the session's stream now rather than when it is garbage collected,
+            # so that a command whose output is abandoned is interrupted right away
+            await stream.aclose()
+            if self._cache is not None and _is_mutating(command):
+                self._cache.invalidate()
+
+
+_default_bash_tool: Optional[BashTool] = None
+
+
+def get_default_bash_tool(shared_cache: Optional[ToolCallCache] = None) -> BashTool:
+    """Return the process-wide BashTool, creating it on first use.
+
+    Every agent that uses it shares one live bash session, so the working
+    directory and exported variables stay consistent between them. Commands
+    from different agents must therefore not run concurrently.
+    Each call sets its cache to `shared_cache` (None disables caching).
+    """
+    global _default_bash_tool
+    if _default_bash_tool is None:
+        _default_bash_tool = BashTool(shared_cache=shared_cache)
+    else:
+        # the tool is shared, so it uses the cache of the agents created last
+        _default_bash_tool._cache = shared_cache
+    return _default_bash_tool
+
 
 if __name__ == "__main__":
     bash = BashTool()
@@ -0,0 +1,92 @@
+import json
+from typing import Any, Dict, List
+
+from .browser_use_tool import _SEP, BrowserManager, _BrowserTool
+
+
+# action type -> (BrowserManager method, required arguments, whether the action changes the page)
+_CHAIN_ACTIONS = {
+    "navigate": ("navigate", ("url",), True),
+    "click": ("click", ("index",), True),
+    "input_text": ("input_text", ("index", "text"), True),
+    "scroll": ("scroll", ("amount",), True),
+    "refresh": ("refresh", (), True),
+    "execute_js": ("execute_js", ("script",), True),
+    "get_text": ("get_text", (), False),
+    "get_html": ("get_html", (), False),
+}
+
+
+class BrowserChainTool(_BrowserTool):
+    """Tool to run a sequence of browser actions in a single call."""
+    name = "browser_chain"
+    description = """Run a sequence of browser actions in a single call, then return the result of each action followed by the state of the page (url, title and the beginning of the visible text).
+Use it to do several steps at once, e.g. navigate to a page, fill in a form and submit it, instead of calling one tool per step.
+Each action is a dict with a "type" and its arguments:
+* {"type": "navigate", "url": "https://..."}
+* {"type": "click", "index": 3}
+* {"type": "input_text", "index": 3, "text": "..."}
+* {"type": "scroll", "amount": 500} (positive for down, negative for up)
+* {"type": "refresh"}
+* {"type": "execute_js", "script": "..."}
+* {"type": "get_text"}
+* {"type": "get_html"}
+The chain stops at the first action that fails."""
+    # 日本語訳：
+    # 一連のブラウザ操作を1回の呼び出しで実行し、各操作の結果とページの状態（URL、タイトル、表示テキストの冒頭）を返します。
+    # ページに移動してフォームに入力し送信する等、1ステップごとにツールを呼び出す代わりに複数の操作をまとめて実行する場合に使用してください。
+    # 最初に失敗した操作でチェーンは停止します。
+
+    inputs = {
+        "actions": {
+            "type": "array",
+            "description": 'The list of actions to run in order, e.g. [{"type": "navigate", "url": "https://example.com"}, {"type": "get_text"}].',
+        }
+    }
+    output_type = "string"
+
+    def __init__(self, browser_manager: BrowserManager, network_idle_timeout: float = 1.5):
+        super().__init__(browser_manager)
+        self.network_idle_timeout = network_idle_timeout
+
+    async def forward(self, actions: List[Dict[str, Any]]) -> str:
+        if not actions:
+            raise Exception("no actions provided.")
+
+        results = []
+        for i, action in enumerate(actions, start=1):
+            action_type = action.get("type") if isinstance(action, dict) else None
+            if action_type not in _CHAIN_ACTIONS:
+                results.append(
+                    f"[{i}] Error: unknown action {action!r}. Allowed types are: {', '.join(_CHAIN_ACTIONS)}"
+                )
+                break
+            method_name, arg_names, changes_page = _CHAIN_ACTIONS[action_type]
+            missing = [name for name in arg_names if name not in action]
+            if missing:
+                results.append(f"[{i}] Error: {action_type} requires {', '.join(missing)}")
+                break
+
+            kwargs = {name: action[name] for name in arg_names}
+            if action_type == "navigate":
+                # the page state is appended at the end of the chain, so don't return the whole text here
+                kwargs["return_text"] = False
+            try:
+                result = await getattr(self.browser_manager, method_name)(**kwargs)
+            except Exception as e:
+                results.append(f"[{i}] {action_type}: Error: {e}")
+                break
+            results.append(f"[{i}] {action_type}: {result}")
+            if isinstance(result, str) and result.startswith("Error"):
+                break
+
+            if changes_page:
+                await self.browser_manager.wait_for_network_idle(timeout=self.network_idle_timeout)
+
+        state = await self.browser_manager.page_summary()
+        return (
+            "\n".join(results)
+            + _SEP
+            + "Page state:\n"
+            + json.dumps(state, ensure_ascii=False, indent=2)
+        )
@@ -1,48 +1,193 @@
-from typing import Dict, List, Optional, Any, Union
+from typing import AsyncIterator, DefaultDict, Dict, List, Optional, Any, Set, Union
 import asyncio
+import atexit
+import contextlib
+from collections import OrderedDict, defaultdict
+import hashlib
 import json
+import os
+import tempfile
+import time
 
+import aiofiles
 from browser_use import Browser as BrowserUseBrowser
 from browser_use import BrowserConfig
-from browser_use.browser.context import BrowserContext
+from browser_use.browser.context import BrowserContext, BrowserContextConfig
 from browser_use.dom.service import DomService
+from browser_use.dom.views import DOMElementNode
+from playwright.async_api import Error as PlaywrightError
+from playwright.async_api import Page
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 
 from smolagents import Tool
 
 
-class BrowserNavigationTool(Tool):
+# separates the header of a tool's output from the content
+_SEP = "\n======================\n"
+# number of page texts / html documents kept per BrowserManager
+_PAGE_CACHE_SIZE = 32
+# open tabs per BrowserManager, and pages being opened at the same time
+_MAX_TABS = 8
+# characters of html returned by get_html
+_HTML_LIMIT = 2000
+# scripts evaluated in the page (the %-placeholders are filled in by the caller)
+_INNER_TEXT_JS = "document.body.innerText"
+# first %d characters of the html and its total length
+_OUTER_HTML_JS = "(() => { const html = document.documentElement.outerHTML; return [html.slice(0, %d), html.length]; })()"
+# scrolls by %d pixels and returns the new and the maximum scroll position
+_SCROLL_JS = (
+    "(() => { window.scrollBy(0, %d); "
+    "return [window.scrollY, document.documentElement.scrollHeight - window.innerHeight]; })()"
+)
+# evaluates the expression (second %s) only if the DOM version differs from the known one (first %s, JSON).
+# the version counts the mutations of the document since a MutationObserver was installed on it,
+# prefixed with a token of the document, so that it also changes when the page is replaced
+_VERSIONED_READ_JS = """(() => {
+    if (window.__manusDomVersion === undefined) {
+        window.__manusDomVersion = 0;
+        window.__manusDomToken = Math.random().toString(36).slice(2);
+        new MutationObserver(() => { window.__manusDomVersion++; }).observe(
+            document, {subtree: true, childList: true, characterData: true, attributes: true}
+        );
+    }
+    const version = window.__manusDomToken + ":" + window.__manusDomVersion;
+    return [version, version === %s ? null : (%s)];
+})()"""
+# url, title and the first %d characters of the text
+_PAGE_SUMMARY_JS = (
+    "({url: location.href, title: document.title, visible_text_snippet: document.body.innerText.slice(0, %d)})"
+)
+# url and the first %d characters of the text
+_PAGE_TEXT_JS = "({url: location.href, text: document.body.innerText.slice(0, %d)})"
+# seconds during which a tab measured at the bottom is assumed not to have grown
+_SCROLL_STATE_TTL = 1.0
+# where screenshots are saved, named by the hash of their content
+_SCREENSHOT_DIR = os.path.join(tempfile.gettempdir(), "smolagents_manus_screenshots")
+
+# chromium flags when the agent only needs the text and the elements of pages.
+# images are disabled by a launch flag rather than by intercepting requests: a route handler
+# would add a round trip to the driver for every request of the page
+_TEXT_ONLY_CHROMIUM_ARGS = [
+    "--disable-gpu",
+    "--disable-dev-shm-usage",
+    "--blink-settings=imagesEnabled=false",
+]
+_TEXT_ONLY_WINDOW_SIZE = {"width": 800, "height": 600}
+
+
+async def _write_screenshot(raw: bytes, path: Optional[str] = None) -> str:
+    """Write PNG bytes to `path`, or to a file named by their hash in `_SCREENSHOT_DIR`, and return the path."""
+    if path is None:
+        os.makedirs(_SCREENSHOT_DIR, exist_ok=True)
+        path = os.path.join(_SCREENSHOT_DIR, f"{hashlib.sha256(raw).hexdigest()[:16]}.png")
+    async with aiofiles.open(path, "wb") as f:
+        await f.write(raw)
+    return path
+
+
+# tool classes whose class-level schema (name, inputs, output_type, forward signature) has been validated
+_VALIDATED_TOOL_CLASSES: Set[type] = set()
+
+
+class _BrowserTool(Tool):
+    """Base class of the tools that act on a BrowserManager.
+
+    smolagents validates the schema of a tool every time it is instantiated,
+    but the schema is defined on the class, so it is only validated for the
+    first instance of each class.
+    """
+
+    def __init__(self, browser_manager: "BrowserManager") -> None:
+        super().__init__()
+        self.browser_manager = browser_manager
+
+    def validate_arguments(self) -> None:
+        if type(self) not in _VALIDATED_TOOL_CLASSES:
+            super().validate_arguments()
+            _VALIDATED_TOOL_CLASSES.add(type(self))
+
+
+class _ObservingBrowserTool(_BrowserTool):
+    """Base class of the tools that don't return the same observation twice in a row.
+
+    The last observation is remembered per tool instance, i.e. per agent, so that
+    agents sharing a BrowserManager don't hide pages from each other. It is
+    forgotten when the page changes and when the agent starts a new run.
+    """
+
+    def __init__(self, browser_manager: "BrowserManager") -> None:
+        super().__init__(browser_manager)
+        # (page generation of the manager, hash) of the last observation returned
+        self._last_observation: Optional[tuple] = None
+
+    def reset_observation(self) -> None:
+        """Return the next observation in full, e.g. at the start of an agent run."""
+        self._last_observation = None
+
+    def _seen(self, digest: str) -> bool:
+        """Return whether `digest` was the last observation on the current page, and remember it."""
+        observation = (self.browser_manager.page_generation, digest)
+        if observation == self._last_observation:
+            return True
+        self._last_observation = observation
+        return False
+
+
+class BrowserNavigationTool(_BrowserTool):
     """Tool to navigate to a URL in the browser."""
     name = "browser_navigate"
     description = "Navigate the browser to a specified URL and return the page content."
     inputs = {"url": {"type": "string", "description": "The URL to navigate to."}}
     output_type = "string"
 
-    def __init__(self, browser_manager):
-        super().__init__()
-        self.browser_manager = browser_manager
-
     async def forward(self, url: str) -> str:
         result = await self.browser_manager.navigate(url)
-        return f"Navigated to: {url}\n======================\n{result}"
+        return f"Navigated to: {url}{_SEP}{result}"
+
+
+class BrowserNavigateManyTool(_BrowserTool):
+    """Tool to load several URLs concurrently."""
+    name = "browser_navigate_many"
+    description = "Load several URLs at the same time and return the text content of each page. Use it instead of navigating to the pages one by one when you need to read several pages."
+    inputs = {"urls": {"type": "array", "description": "The list of URLs to load."}}
+    output_type = "string"
+
+    async def forward(self, urls: List[str]) -> str:
+        if not urls:
+            raise Exception("no urls provided.")
+        results = await self.browser_manager.navigate_many(urls)
+        return "\n\n".join(
+            f"Navigated to: {url}{_SEP}{result}" for url, result in zip(urls, results)
+        )
 
 
-class BrowserClickTool(Tool):
+class BrowserClickTool(_BrowserTool):
     """Tool to click on an element in the browser."""
     name = "browser_click"
     description = "Click on an element at a specified index in the browser page."
     inputs = {"index": {"type": "integer", "description": "The index of the element to click on."}}
     output_type = "string"
 
-    def __init__(self, browser_manager):
-        super().__init__()
-        self.browser_manager = browser_manager
-
     async def forward(self, index: int) -> str:
         result = await self.browser_manager.click(index)
-        return f"Clicked element at index {index}\n======================\n{result}"
+        return f"Clicked element at index {index}{_SEP}{result}"
+
+
+class BrowserClickAndReadTool(_BrowserTool):
+    """Tool to click on an element and read the resulting page."""
+    name = "browser_click_and_read"
+    description = "Click on an element at a specified index and return the URL and the text of the page after the click."
+    inputs = {"index": {"type": "integer", "description": "The index of the element to click on."}}
+    output_type = "string"
+
+    async def forward(self, index: int) -> str:
+        result = await self.browser_manager.click_and_read(index)
+        if "error" in result:
+            return f"Error: {result['error']}"
+        return f"Clicked element at index {index}, now at: {result['url']}{_SEP}{result['text']}"
 
 
-class BrowserInputTextTool(Tool):
+class BrowserInputTextTool(_BrowserTool):
     """Tool to input text into an element in the browser."""
     name = "browser_input_text"
     description = "Input text into an element at a specified index in the browser page."
@@ -52,302 +197,580 @@ class BrowserInputTextTool(Tool):
     }
     output_type = "string"
 
-    def __init__(self, browser_manager):
-        super().__init__()
-        self.browser_manager = browser_manager
-
     async def forward(self, index: int, text: str) -> str:
         result = await self.browser_manager.input_text(index, text)
-        return f"Input text '{text}' into element at index {index}\n======================\n{result}"
+        return f"Input text '{text}' into element at index {index}{_SEP}{result}"
 
 
-class BrowserGetHtmlTool(Tool):
+class BrowserGetHtmlTool(_BrowserTool):
     """Tool to get the HTML content of the current page."""
     name = "browser_get_html"
     description = "Get the HTML content of the current page."
     inputs = {}
     output_type = "string"
 
-    def __init__(self, browser_manager):
-        super().__init__()
-        self.browser_manager = browser_manager
-
     async def forward(self) -> str:
         result = await self.browser_manager.get_html()
-        return f"HTML content of the current page:\n======================\n{result}"
+        return f"HTML content of the current page:{_SEP}{result}"
 
 
-class BrowserGetTextTool(Tool):
+class BrowserGetTextTool(_ObservingBrowserTool):
     """Tool to get the text content of the current page."""
     name = "browser_get_text"
     description = "Get the text content of the current page."
     inputs = {}
     output_type = "string"
 
-    def __init__(self, browser_manager):
-        super().__init__()
-        self.browser_manager = browser_manager
-
     async def forward(self) -> str:
         result = await self.browser_manager.get_text()
-        return f"Text content of the current page:\n======================\n{result}"
+        # don't send the same page text to the model again if nothing has changed since the last read
+        if self._seen(hashlib.sha256(result.encode()).hexdigest()):
+            return "Text content of the current page is unchanged since the last read."
+        return f"Text content of the current page:{_SEP}{result}"
 
 
-class BrowserScrollTool(Tool):
+class BrowserScrollTool(_BrowserTool):
     """Tool to scroll the browser page."""
     name = "browser_scroll"
     description = "Scroll the browser page by a specified amount of pixels (positive for down, negative for up)."
     inputs = {"amount": {"type": "integer", "description": "The number of pixels to scroll (positive for down, negative for up)."}}
     output_type = "string"
 
-    def __init__(self, browser_manager):
-        super().__init__()
-        self.browser_manager = browser_manager
-
     async def forward(self, amount: int) -> str:
-        direction = "down" if amount > 0 else "up"
-        result = await self.browser_manager.scroll(amount)
-        return f"Scrolled {direction} by {abs(amount)} pixels\n======================\n{result}"
+        # the manager already describes what happened (including when the page couldn't move)
+        return await self.browser_manager.scroll(amount)
 
 
-class BrowserSwitchTabTool(Tool):
+class BrowserSwitchTabTool(_BrowserTool):
     """Tool to switch between browser tabs."""
     name = "browser_switch_tab"
     description = "Switch to a different tab in the browser by specifying the tab ID."
     inputs = {"tab_id": {"type": "integer", "description": "The ID of the tab to switch to."}}
     output_type = "string"
 
-    def __init__(self, browser_manager):
-        super().__init__()
-        self.browser_manager = browser_manager
-
     async def forward(self, tab_id: int) -> str:
         result = await self.browser_manager.switch_tab(tab_id)
-        return f"Switched to tab {tab_id}\n======================\n{result}"
+        return f"Switched to tab {tab_id}{_SEP}{result}"
 
 
-class BrowserNewTabTool(Tool):
+class BrowserNewTabTool(_BrowserTool):
     """Tool to open a new browser tab."""
     name = "browser_new_tab"
     description = "Open a new tab in the browser and navigate to the specified URL."
     inputs = {"url": {"type": "string", "description": "The URL to navigate to in the new tab."}}
     output_type = "string"
 
-    def __init__(self, browser_manager):
-        super().__init__()
-        self.browser_manager = browser_manager
-
     async def forward(self, url: str) -> str:
         result = await self.browser_manager.new_tab(url)
-        return f"Opened new tab with URL: {url}\n======================\n{result}"
+        return f"Opened new tab with URL: {url}{_SEP}{result}"
 
 
-class BrowserCloseTabTool(Tool):
+class BrowserCloseTabTool(_BrowserTool):
     """Tool to close the current browser tab."""
     name = "browser_close_tab"
     description = "Close the current tab in the browser."
     inputs = {}
     output_type = "string"
 
-    def __init__(self, browser_manager):
-        super().__init__()
-        self.browser_manager = browser_manager
-
     async def forward(self) -> str:
         result = await self.browser_manager.close_tab()
-        return f"Closed current tab\n======================\n{result}"
+        return f"Closed current tab{_SEP}{result}"
 
 
-class BrowserRefreshTool(Tool):
+class BrowserRefreshTool(_BrowserTool):
     """Tool to refresh the current browser page."""
     name = "browser_refresh"
     description = "Refresh the current page in the browser."
     inputs = {}
     output_type = "string"
 
-    def __init__(self, browser_manager):
-        super().__init__()
-        self.browser_manager = browser_manager
-
     async def forward(self) -> str:
         result = await self.browser_manager.refresh()
-        return f"Refreshed current page\n======================\n{result}"
+        return f"Refreshed current page{_SEP}{result}"
 
 
-class BrowserExecuteJsTool(Tool):
+class BrowserExecuteJsTool(_BrowserTool):
     """Tool to execute JavaScript in the browser."""
     name = "browser_execute_js"
     description = "Execute JavaScript code in the browser and return the result."
     inputs = {"script": {"type": "string", "description": "The JavaScript code to execute."}}
     output_type = "string"
 
-    def __init__(self, browser_manager):
-        super().__init__()
-        self.browser_manager = browser_manager
-
     async def forward(self, script: str) -> str:
         result = await self.browser_manager.execute_js(script)
-        return f"Executed JavaScript:\n{script}\n======================\nResult: {result}"
+        return f"Executed JavaScript:\n{script}{_SEP}Result: {result}"
 
 
-class BrowserScreenshotTool(Tool):
+class BrowserScreenshotTool(_ObservingBrowserTool):
     """Tool to take a screenshot of the current page."""
     name = "browser_screenshot"
-    description = "Take a screenshot of the current page."
+    description = "Take a screenshot of the current page and save it as a PNG file. Returns the path of the file, which can be passed to tools that inspect images."
     inputs = {}
     output_type = "string"
 
-    def __init__(self, browser_manager):
+    async def forward(self) -> str:
+        raw = await self.browser_manager.screenshot()
+        # skip identical captures, e.g. when polling a page while waiting for it to change
+        screenshot_hash = hashlib.sha256(raw).hexdigest()
+        if self._seen(screenshot_hash):
+            return f"Screenshot unchanged since the last capture (sha256: {screenshot_hash[:16]})."
+        path = await _write_screenshot(raw)
+        return f"Screenshot saved to {path} ({len(raw)} bytes)"
+
+
+
+class BrowserExpandToolsTool(Tool):
+    """Tool that adds the rarely used browser tools to the agent on demand."""
+    name = "browser_expand_tools"
+    description = "Make the extended browser tools available (e.g. tabs, page refresh, JavaScript execution, raw HTML). Call it only if the current tools are not enough."
+    inputs = {}
+    output_type = "string"
+
+    def __init__(self, extended_tools: List[Tool]) -> None:
         super().__init__()
-        self.browser_manager = browser_manager
+        self.extended_tools = extended_tools
+        # the agent's `tools` dict, bound after the agent is created
+        self.agent_tools: Optional[Dict[str, Tool]] = None
 
-    async def forward(self) -> str:
-        result = await self.browser_manager.screenshot()
-        return f"Screenshot taken. Base64 image data length: {len(result)}"
+    def forward(self) -> str:
+        if self.agent_tools is None:
+            return "Error: tools cannot be expanded, this tool is not bound to an agent"
+        added = [tool.name for tool in self.extended_tools if tool.name not in self.agent_tools]
+        for tool in self.extended_tools:
+            self.agent_tools.setdefault(tool.name, tool)
+        if not added:
+            return "Extended browser tools are already available"
+        return f"Added browser tools: {', '.join(added)}"
 
 
 class BrowserManager:
     """Manager class for browser interactions using browser-use library."""
+
+    # per-process managers returned by `shared()`, keyed by `headless`
+    _INSTANCES: Dict[bool, "BrowserManager"] = {}
+
+    @classmethod
+    def shared(cls, headless: bool = False) -> "BrowserManager":
+        """Return the per-process manager for `headless`, so that all agents share one browser."""
+        instance = cls._INSTANCES.get(headless)
+        if instance is None:
+            instance = cls._INSTANCES[headless] = cls(headless=headless)
+        return instance
     
-    def __init__(self, headless: bool = False):
-        self.lock = asyncio.Lock()
-        self.browser = None
-        self.context = None
-        self.dom_service = None
+    def __init__(
+        self,
+        headless: bool = False,
+        browser: Optional[BrowserUseBrowser] = None,
+        optimize_for_text: bool = False,
+    ):
+        """
+        Args:
+            headless: Run the browser without a visible window.
+            browser: An already running browser to open this manager's context in.
+                The browser is then owned (and closed) by the caller.
+            optimize_for_text: Don't load images and use a small window. Pages load faster,
+                but screenshots show no images, so only enable it for agents that don't look at them.
+                Has no effect on the images of a `browser` passed in, which is launched by the caller.
+        """
+        self.optimize_for_text = optimize_for_text
+        # asyncio primitives are created on first use, inside the event loop that uses them,
+        # so that the manager can be constructed outside of an event loop (e.g. by the agent factories)
+        # only guards the lazy creation of the browser and the context
+        self._init_lock_instance: Optional[asyncio.Lock] = None
+        # operations that change a tab are serialized per tab; reads of any tab may overlap
+        self._tab_locks: DefaultDict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._read_semaphore_instance: Optional[asyncio.Semaphore] = None
+        # bounds the tabs / temporary contexts being created at the same time
+        self._tab_semaphore_instance: Optional[asyncio.Semaphore] = None
+        # (DOM version, text / html) of pages keyed by (tab id, url), dropped whenever the tab may have
+        # changed and only reused while the page reports the same DOM version
+        self._text_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._html_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        # (scrollY, max scrollY, time measured) of each tab after its last scroll
+        self._scroll_state: Dict[int, tuple] = {}
+        # active page of the context, reset whenever the active tab changes and checked before each use
+        self._page: Optional[Page] = None
+        # tab list of the last get_state(), reused until an action may have changed it
+        self._tabs: Optional[List[Dict[str, Any]]] = None
+        # (tab id, selector map) of the elements listed by the last get_state()
+        self._selector_map: Optional[tuple] = None
+        self.browser = browser
+        self._owns_browser = browser is None
+        self.context: Optional[BrowserContext] = None
         self.headless = headless
-        self.current_url = None
+        self.current_url: Optional[str] = None
+        # incremented whenever the active page is navigated or replaced, so that tools
+        # return their next observation in full
+        self.page_generation = 0
     
+    @property
+    def _init_lock(self) -> asyncio.Lock:
+        if self._init_lock_instance is None:
+            self._init_lock_instance = asyncio.Lock()
+        return self._init_lock_instance
+
+    @property
+    def _read_semaphore(self) -> asyncio.Semaphore:
+        if self._read_semaphore_instance is None:
+            self._read_semaphore_instance = asyncio.Semaphore(4)
+        return self._read_semaphore_instance
+
+    @property
+    def _tab_semaphore(self) -> asyncio.Semaphore:
+        if self._tab_semaphore_instance is None:
+            self._tab_semaphore_instance = asyncio.Semaphore(_MAX_TABS)
+        return self._tab_semaphore_instance
+
+    def _page_changed(self) -> None:
+        """Mark the observations made so far as stale, so that the next ones are returned in full."""
+        self.page_generation += 1
+
     async def _ensure_browser_initialized(self) -> BrowserContext:
         """Ensure browser and context are initialized."""
-        if self.browser is None:
-            self.browser = BrowserUseBrowser(BrowserConfig(headless=self.headless))
-        if self.context is None:
-            self.context = await self.browser.new_context()
-            self.dom_service = DomService(await self.context.get_current_page())
-        return self.context
+        async with self._init_lock:
+            if self.browser is None:
+                extra_args = _TEXT_ONLY_CHROMIUM_ARGS if self.optimize_for_text else []
+                self.browser = BrowserUseBrowser(
+                    BrowserConfig(headless=self.headless, extra_chromium_args=list(extra_args))
+                )
+            if self.context is None:
+                self.context = await self._new_context()
+            return self.context
+
+    async def _current_page(self, context: BrowserContext) -> Page:
+        """Return the active page, resolved once and reused while it is still the context's active tab.
+
+        A click or a script may open or close a tab behind the manager's back, so the
+        cached page is checked against the context's pages (a local lookup, no round trip).
+        """
+        if self._page is not None:
+            pages = (await context.get_session()).context.pages
+            if self._page.is_closed() or not pages or pages[-1] is not self._page:
+                self._page = None
+        if self._page is None:
+            self._page = await context.get_current_page()
+        return self._page
+
+    async def _evaluate(self, context: BrowserContext, script: str) -> Any:
+        """Evaluate `script` on the active page, like `context.execute_javascript` without re-resolving the page."""
+        page = await self._current_page(context)
+        return await page.evaluate(script)
+
+    async def _active_tab_id(self, context: BrowserContext) -> int:
+        return id(await self._current_page(context))
+
+    def _cache_put(self, cache: "OrderedDict[tuple, tuple]", key: tuple, value: tuple) -> None:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > _PAGE_CACHE_SIZE:
+            cache.popitem(last=False)
+
+    async def _read_versioned(self, context: BrowserContext, cache: "OrderedDict[tuple, tuple]", expression: str) -> Any:
+        """Evaluate `expression` on the active page, or return its cached value if the DOM has not changed since.
+
+        A single round trip either way: on a hit only the DOM version crosses the CDP connection.
+        """
+        key = (await self._active_tab_id(context), self.current_url)
+        cached = cache.get(key)
+        known_version = cached[0] if cached is not None else None
+        version, value = await self._evaluate(context, _VERSIONED_READ_JS % (json.dumps(known_version), expression))
+        if value is None and cached is not None:
+            cache.move_to_end(key)
+            return cached[1]
+        self._cache_put(cache, key, (version, value))
+        return value
+
+    def _invalidate_cache(self, tab_id: int, keep_tabs: bool = False) -> None:
+        """Forget the cached text / html of a tab after an action that may have changed it.
+
+        The tab list is dropped too (a click may open a tab or change a title) unless `keep_tabs`.
+        """
+        if not keep_tabs:
+            self._tabs = None
+        self._scroll_state.pop(tab_id, None)
+        if self._selector_map is not None and self._selector_map[0] == tab_id:
+            self._selector_map = None
+        for cache in (self._text_cache, self._html_cache):
+            for key in [key for key in cache if key[0] == tab_id]:
+                del cache[key]
+
+    async def _new_context(self) -> BrowserContext:
+        """Open a new context in the browser, with a small window if `optimize_for_text`."""
+        if not self.optimize_for_text:
+            return await self.browser.new_context()
+        return await self.browser.new_context(BrowserContextConfig(browser_window_size=_TEXT_ONLY_WINDOW_SIZE))
+
+    async def _get_element_by_index(self, context: BrowserContext, index: int) -> Optional[DOMElementNode]:
+        """Look up an element in the map of the last get_state(), falling back to the context's own state."""
+        if self._selector_map is not None and self._selector_map[0] == await self._active_tab_id(context):
+            return self._selector_map[1].get(index)
+        # get_dom_element_by_index() would raise KeyError for an unknown index
+        return (await context.get_selector_map()).get(index)
+
+    @contextlib.asynccontextmanager
+    async def _tab_access(self, exclusive: bool = True) -> AsyncIterator[BrowserContext]:
+        """Yield the context with access to the active tab.
+
+        Exclusive access holds the tab's lock. Shared access (for reads) waits for
+        an in-flight change of the tab to finish, then runs alongside other reads,
+        up to the capacity of the read semaphore.
+        """
+        context = await self._ensure_browser_initialized()
+        lock = self._tab_locks[await self._active_tab_id(context)]
+        if exclusive:
+            async with lock:
+                yield context
+        else:
+            async with self._read_semaphore:
+                async with lock:
+                    pass
+                yield context
     
-    async def navigate(self, url: str) -> str:
+    async def navigate(self, url: str, return_text: bool = True) -> str:
         """Navigate to a URL and return the page content."""
-        async with self.lock:
-            context = await self._ensure_browser_initialized()
+        async with self._tab_access() as context:
+            tab_id = await self._active_tab_id(context)
+            self._invalidate_cache(tab_id)
             await context.navigate_to(url)
             self.current_url = url
-            return await self.get_text()
+            self._page_changed()
+            if not return_text:
+                return f"Navigated to {url}"
+            # the tab lock is not reentrant, so read the text without going through get_text().
+            # it is not cached: content loaded after the page load must be seen by the next read
+            return await context.execute_javascript(_INNER_TEXT_JS)
     
+    async def navigate_many(self, urls: List[str]) -> List[str]:
+        """Load each URL in its own context concurrently and return the text of each page.
+
+        The pages are loaded in separate contexts that are closed afterwards, so
+        the current page of this manager is left untouched.
+        """
+        await self._ensure_browser_initialized()
+        results = await asyncio.gather(
+            *(self._navigate_in_new_context(url) for url in urls), return_exceptions=True
+        )
+        return [
+            f"Error: failed to load {url}: {result}" if isinstance(result, Exception) else result
+            for url, result in zip(urls, results)
+        ]
+
+    async def _navigate_in_new_context(self, url: str) -> str:
+        # bounds the number of pages opened at once when many URLs are loaded in parallel
+        async with self._tab_semaphore:
+            context = await self._new_context()
+            try:
+                await context.navigate_to(url)
+                # not self._evaluate(): that evaluates on this manager's own page, not on the new context's
+                return await context.execute_javascript(_INNER_TEXT_JS)
+            finally:
+                await context.close()
+
     async def click(self, index: int) -> str:
         """Click an element at the specified index and return the page state."""
-        async with self.lock:
-            context = await self._ensure_browser_initialized()
-            element = await context.get_dom_element_by_index(index)
+        async with self._tab_access() as context:
+            element = await self._get_element_by_index(context, index)
             if not element:
                 return f"Error: Element with index {index} not found"
+            self._invalidate_cache(await self._active_tab_id(context))
             download_path = await context._click_element_node(element)
             output = f"Clicked element at index {index}"
             if download_path:
                 output += f" - Downloaded file to {download_path}"
             return output
     
+    async def click_and_read(self, index: int, text_limit: int = 2000) -> Dict[str, Any]:
+        """Click an element and return the URL and the beginning of the text of the resulting page.
+
+        The click goes through Playwright like `click()` (a trusted event, which also
+        reaches elements inside iframes), and the page is then read in a single round trip.
+        """
+        async with self._tab_access() as context:
+            element = await self._get_element_by_index(context, index)
+            if not element:
+                return {"error": f"Element with index {index} not found"}
+            self._invalidate_cache(await self._active_tab_id(context))
+            await context._click_element_node(element)
+            # the click may have opened a tab, which is then the active page
+            page = await self._current_page(context)
+            script = _PAGE_TEXT_JS % int(text_limit)
+            try:
+                result = await page.evaluate(script)
+            except PlaywrightError as e:
+                # a navigation started by the click replaced the document while it was being read
+                if "Execution context was destroyed" not in str(e):
+                    raise
+                with contextlib.suppress(PlaywrightTimeoutError):
+                    await page.wait_for_load_state("domcontentloaded", timeout=5000)
+                result = await page.evaluate(script)
+            self.current_url = result["url"]
+            self._page_changed()
+            return result
+
     async def input_text(self, index: int, text: str) -> str:
         """Input text into an element at the specified index."""
-        async with self.lock:
-            context = await self._ensure_browser_initialized()
-            element = await context.get_dom_element_by_index(index)
+        async with self._tab_access() as context:
+            element = await self._get_element_by_index(context, index)
             if not element:
                 return f"Error: Element with index {index} not found"
+            self._invalidate_cache(await self._active_tab_id(context))
             await context._input_text_element_node(element, text)
             return f"Input '{text}' into element at index {index}"
     
     async def get_html(self) -> str:
         """Get the HTML content of the current page."""
-        async with self.lock:
-            context = await self._ensure_browser_initialized()
-            html = await context.get_page_html()
-            return html[:2000] + "..." if len(html) > 2000 else html
+        async with self._tab_access(exclusive=False) as context:
+            # truncate in the page, so that only the first characters cross the CDP connection
+            html, length = await self._read_versioned(context, self._html_cache, _OUTER_HTML_JS % _HTML_LIMIT)
+            return html + "..." if length > _HTML_LIMIT else html
     
     async def get_text(self) -> str:
         """Get the text content of the current page."""
-        async with self.lock:
-            context = await self._ensure_browser_initialized()
-            text = await context.execute_javascript("document.body.innerText")
-            return text
+        async with self._tab_access(exclusive=False) as context:
+            return await self._read_versioned(context, self._text_cache, _INNER_TEXT_JS)
     
     async def scroll(self, amount: int) -> str:
         """Scroll the page by the specified amount."""
-        async with self.lock:
-            context = await self._ensure_browser_initialized()
-            await context.execute_javascript(f"window.scrollBy(0, {amount});")
-            direction = "down" if amount > 0 else "up"
-            return f"Scrolled {direction} by {abs(amount)} pixels"
+        if amount == 0:
+            return "Scrolled 0 pixels"
+        async with self._tab_access() as context:
+            tab_id = await self._active_tab_id(context)
+            # agents often keep scrolling in a loop; skip the round trip when the page can't move.
+            # the bottom may move as content loads, so it is only trusted for a short while
+            state = self._scroll_state.get(tab_id)
+            if state is not None:
+                y, max_y, measured_at = state
+                if amount < 0 and y <= 0:
+                    return "Already at the top of the page"
+                if amount > 0 and y >= max_y and time.monotonic() - measured_at < _SCROLL_STATE_TTL:
+                    return "Already at the bottom of the page"
+            self._invalidate_cache(tab_id, keep_tabs=True)
+            y, max_y = await self._evaluate(context, _SCROLL_JS % int(amount))
+            self._scroll_state[tab_id] = (y, max_y, time.monotonic())
+            return f"Scrolled {'down' if amount > 0 else 'up'} by {abs(amount)} pixels"
     
     async def execute_js(self, script: str) -> str:
         """Execute JavaScript code and return the result."""
-        async with self.lock:
-            context = await self._ensure_browser_initialized()
-            result = await context.execute_javascript(script)
+        async with self._tab_access() as context:
+            self._invalidate_cache(await self._active_tab_id(context))
+            result = await self._evaluate(context, script)
             return str(result)
     
-    async def screenshot(self) -> str:
-        """Take a screenshot and return it as a base64 string."""
-        async with self.lock:
-            context = await self._ensure_browser_initialized()
-            screenshot = await context.take_screenshot(full_page=True)
-            return screenshot
+    async def screenshot(self) -> bytes:
+        """Take a screenshot and return the raw PNG bytes."""
+        async with self._tab_access(exclusive=False) as context:
+            # BrowserContext.take_screenshot would base64-encode the image; take the bytes from the page directly
+            page = await self._current_page(context)
+            return await page.screenshot(full_page=True)
             
     async def switch_tab(self, tab_id: int) -> str:
         """Switch to a specific tab by ID."""
-        async with self.lock:
-            context = await self._ensure_browser_initialized()
+        async with self._tab_access() as context:
             await context.switch_to_tab(tab_id)
+            self._page = None
+            self._page_changed()
             return f"Switched to tab {tab_id}"
     
     async def new_tab(self, url: str) -> str:
         """Create a new tab and navigate to the specified URL."""
-        async with self.lock:
-            context = await self._ensure_browser_initialized()
-            await context.create_new_tab(url)
+        async with self._tab_access() as context:
+            session = await context.get_session()
+            if len(session.context.pages) >= _MAX_TABS:
+                return f"Error: cannot open more than {_MAX_TABS} tabs, close a tab first"
+            async with self._tab_semaphore:
+                await context.create_new_tab(url)
+            self._page = None
+            self._tabs = None
+            self._page_changed()
             return f"Opened new tab with URL {url}"
     
     async def close_tab(self) -> str:
         """Close the current tab."""
-        async with self.lock:
-            context = await self._ensure_browser_initialized()
+        async with self._tab_access() as context:
             await context.close_current_tab()
+            self._page = None
+            self._tabs = None
+            self._page_changed()
             return "Closed current tab"
     
     async def refresh(self) -> str:
         """Refresh the current page."""
-        async with self.lock:
-            context = await self._ensure_browser_initialized()
+        async with self._tab_access() as context:
+            self._invalidate_cache(await self._active_tab_id(context))
             await context.refresh_page()
+            self._page_changed()
             return "Refreshed current page"
     
+    async def wait_for_network_idle(self, timeout: float = 1.5) -> None:
+        """Wait until the current page has no network activity for a while, at most `timeout` seconds."""
+        async with self._tab_access(exclusive=False) as context:
+            page = await self._current_page(context)
+            try:
+                await page.wait_for_load_state("networkidle", timeout=timeout * 1000)
+            except PlaywrightTimeoutError:
+                # pages that keep polling never become idle; this wait is best-effort
+                pass
+
+    async def page_summary(self, text_limit: int = 500) -> Dict[str, Any]:
+        """Get the URL, title and the beginning of the visible text of the current page."""
+        async with self._tab_access(exclusive=False) as context:
+            return await self._evaluate(context, _PAGE_SUMMARY_JS % int(text_limit))
+
     async def get_state(self) -> Dict[str, Any]:
         """Get the current browser state."""
-        async with self.lock:
-            context = await self._ensure_browser_initialized()
-            state = await context.get_state()
+        async with self._tab_access(exclusive=False) as context:
+            # like BrowserContext.get_state(): wait for the page to settle and drop highlights left by
+            # an earlier state, so that they are not listed as elements
+            await context._wait_for_page_and_frames_load()
+            await context.remove_highlights()
+            page = await self._current_page(context)
+            # the sub-queries are independent round trips, so run them concurrently
+            queries = [
+                page.title(),
+                DomService(page).get_clickable_elements(
+                    highlight_elements=False, viewport_expansion=context.config.viewport_expansion
+                ),
+            ]
+            if self._tabs is None:
+                queries.append(context.get_tabs_info())
+            title, dom_state, *tabs = await asyncio.gather(*queries)
+            if tabs:
+                # plain field dicts; TabInfo has no computed fields, so model_dump() would only add overhead
+                self._tabs = [dict(tab.__dict__) for tab in tabs[0]]
+            # the indices shown to the agent refer to this map, so click / input_text must use it
+            self._selector_map = (id(page), dom_state.selector_map)
             state_info = {
-                "url": state.url,
-                "title": state.title,
-                "tabs": [tab.model_dump() for tab in state.tabs],
-                "interactive_elements": state.element_tree.clickable_elements_to_string(),
+                "url": page.url,
+                "title": title,
+                "tabs": self._tabs,
+                "interactive_elements": dom_state.element_tree.clickable_elements_to_string(),
             }
             return state_info
     
-    async def cleanup(self):
+    async def cleanup(self) -> None:
         """Clean up browser resources."""
-        async with self.lock:
+        async with self._init_lock:
             if self.context is not None:
                 await self.context.close()
                 self.context = None
-                self.dom_service = None
+                self._page = None
             if self.browser is not None:
-                await self.browser.close()
+                if self._owns_browser:
+                    await self.browser.close()
                 self.browser = None
 
 
+@atexit.register
+def _cleanup_shared_managers() -> None:
+    # best effort: the browser process is terminated with the playwright driver anyway
+    for manager in BrowserManager._INSTANCES.values():
+        if manager.browser is not None:
+            with contextlib.suppress(Exception):
+                asyncio.run(manager.cleanup())
+
+
 # Example usage
-async def main():
+async def main() -> None:
     browser_manager = BrowserManager(headless=False)
     
     # Create tools
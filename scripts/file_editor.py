@@ -1,9 +1,18 @@
-from typing import Optional, List, Union, get_args
+from typing import IO, Any, Callable, DefaultDict, Deque, Iterator, Optional, List, Set, Tuple, Union, get_args
 from smolagents import Tool
+import asyncio
+import contextlib
+import functools
+import io
 import os
-import aiofiles
+import stat
+import threading
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+from .tool_cache import ToolCallCache, cache_if
+
 # Literal型の代わりにstr型を使用
 # Command = Literal[
 #     "view",
@@ -19,6 +28,155 @@ VALID_COMMANDS = ["view", "create", "str_replace", "insert", "undo_edit"]
 SNIPPET_LINES: int = 4
 MAX_RESPONSE_LEN: int = 16000
 TRUNCATED_MESSAGE: str = "<response clipped><NOTE>To save on context only part of this file has been shown to you. You should retry this tool after you have searched inside the file with `grep -n` in order to find the line numbers of what you are looking for.</NOTE>"
+# number of files whose content FileEditorTool keeps in memory
+CONTENT_CACHE_SIZE: int = 32
+# number of edits per file that `undo_edit` can revert
+MAX_HISTORY_PER_FILE: int = 16
+# file I/O of the file tools runs on this small pool instead of the default executor,
+# so that many concurrent edits do not contend for the disk
+_FILE_IO_POOL = ThreadPoolExecutor(
+    max_workers=int(os.getenv("FILE_IO_THREADS", "4")),
+    thread_name_prefix="file-io",
+)
+
+
+async def run_file_io(func: Callable[..., Any], *args: Any) -> Any:
+    """Run the blocking file operation `func(*args)` on the file I/O pool."""
+    return await asyncio.get_running_loop().run_in_executor(_FILE_IO_POOL, func, *args)
+
+
+def _expand_tabs(text: str) -> str:
+    """str.expandtabs, without copying text that has no tab."""
+    return text.expandtabs() if "\t" in text else text
+
+
+def _file_signature(path: Path) -> Tuple[int, int]:
+    """(mtime, size) of a file, to tell whether it changed since it was cached."""
+    result = os.stat(path)
+    return result.st_mtime_ns, result.st_size
+
+
+def _view_signature(path: str) -> Optional[Tuple[int, int]]:
+    """Signature of the file a `view` reads, so that cached views are dropped when it changes on disk."""
+    try:
+        return _file_signature(Path(path))
+    except OSError:
+        return None
+
+
+def _sync_read(path: Path) -> str:
+    with open(path, "r", encoding="utf-8") as file:
+        return file.read()
+
+
+# directories known to exist, so that repeated writes to them skip os.makedirs
+_known_dirs: Set[str] = set()
+
+
+def _open_for_write(path: str, mode: str = "w") -> IO[str]:
+    """Open `path` for writing, creating its directory first unless it is known to exist."""
+    directory = os.path.dirname(path)
+    if directory and directory not in _known_dirs:
+        os.makedirs(directory, exist_ok=True)
+        _known_dirs.add(directory)
+    try:
+        return open(path, mode, encoding="utf-8")
+    except FileNotFoundError:
+        if directory not in _known_dirs:
+            raise
+        # the directory was removed since we last saw it
+        os.makedirs(directory, exist_ok=True)
+        return open(path, mode, encoding="utf-8")
+
+
+def _sync_write(path: Path, content: str) -> None:
+    # write to the file a symlink points to, rather than replacing the symlink
+    path = os.path.realpath(path)
+    # write a temporary file next to the target and rename it over the target, so that
+    # a crash mid-write never leaves a truncated file behind
+    tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    try:
+        with _open_for_write(tmp_path, "w") as file:
+            file.write(content)
+        try:
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode))
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+
+def _walk_visible(root: str, level: int = 0) -> Iterator[str]:
+    """Yield the non-hidden files and directories (with a trailing `/`) in `root`, descending 2 more levels.
+
+    Like a top-down os.walk, each directory lists its files, then its subdirectories,
+    then the contents of each subdirectory. Hidden directories and symlinks to
+    directories are not descended into.
+    """
+    files, dirs = [], []
+    try:
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                (dirs if is_dir else files).append(entry)
+    except OSError:
+        # os.walk skips unreadable directories too
+        return
+    for entry in files:
+        yield entry.path
+    for entry in dirs:
+        yield entry.path + "/"
+    if level < 2:
+        for entry in dirs:
+            if not entry.is_symlink():
+                yield from _walk_visible(entry.path, level + 1)
+
+
+def _skip_lines(content: str, count: int, start: int = 0) -> int:
+    """Index just past the `count`-th newline of `content` from `start` on, or len(content) + 1 if there are fewer."""
+    index = start - 1
+    for _ in range(count):
+        index = content.find("\n", index + 1)
+        if index == -1:
+            return len(content) + 1
+    return index + 1
+
+
+def _line_window(content: str, index: int, before: int, after: int) -> str:
+    """The line of `content` containing `index`, with up to `before` lines above it and `after` lines below it."""
+    start = content.rfind("\n", 0, index)
+    for _ in range(before):
+        if start == -1:
+            break
+        start = content.rfind("\n", 0, start)
+    end = content.find("\n", index)
+    for _ in range(after):
+        if end == -1:
+            break
+        end = content.find("\n", end + 1)
+    return content[start + 1:end if end != -1 else len(content)]
+
+
+def _occurrence_lines(content: str, sub: str, first: int) -> List[int]:
+    """1-based line numbers on which the occurrences of `sub` start, from the one at index `first` on."""
+    lines = []
+    line, start, index = 1, 0, first
+    while index != -1:
+        line += content.count("\n", start, index)
+        if not lines or lines[-1] != line:
+            lines.append(line)
+        start = index
+        index = content.find(sub, index + max(len(sub), 1))
+    return lines
+
 
 class FileEditorTool(Tool):
     name = "file_editor"
@@ -86,10 +244,30 @@ Notes for using the `str_replace` command:
     }
     output_type = "string"
 
-    def __init__(self):
+    def __init__(self, use_cache: bool = False, shared_cache: Optional[ToolCallCache] = None):
+        """
+        Args:
+            use_cache: Cache the results of `view`. Any other command invalidates the cached views of its path.
+            shared_cache: A cache shared with other tool instances. Implies `use_cache`.
+        """
         super().__init__()
-        self._file_history = {}
-
+        # both are keyed by the path as a str, which hashes faster than a Path
+        # path -> the contents before its last edits, keeping only the most recent ones
+        self._file_history: DefaultDict[str, Deque[str]] = defaultdict(
+            functools.partial(deque, maxlen=MAX_HISTORY_PER_FILE)
+        )
+        # path -> (signature, content) of recently read or written files, least recently used first
+        self._content_cache: "OrderedDict[str, Tuple[Tuple[int, int], str]]" = OrderedDict()
+        self._cache = shared_cache if shared_cache is not None else (ToolCallCache() if use_cache else None)
+
+    @cache_if(
+        tool_name="file_editor",
+        cacheable=lambda command, path, *args, **kwargs: command == "view",
+        tag=lambda command, path, *args, **kwargs: os.path.normpath(path),
+        key_parts=lambda tool, command, path, *args, **kwargs: (_view_signature(path),),
+        # a directory listing can change anywhere below it, which its own mtime does not show
+        bypass=lambda tool, command, path, *args, **kwargs: os.path.isdir(path),
+    )
     async def forward(
         self,
         command: str,  # Literal型からstr型に変更
@@ -111,9 +289,7 @@ Notes for using the `str_replace` command:
                 if file_text is None:
                     return "Error: Parameter `file_text` is required for command: create"
                 await self.write_file(_path, file_text)
-                if _path not in self._file_history:
-                    self._file_history[_path] = []
-                self._file_history[_path].append(file_text)
+                self._file_history[os.fspath(_path)].append(file_text)
                 return f"File created successfully at: {_path}"
             elif command == "str_replace":
                 if old_str is None:
@@ -142,17 +318,21 @@ Notes for using the `str_replace` command:
             raise ValueError(
                 f"The path {path} is not an absolute path, it should start with `/`. Maybe you meant {suggested_path}?"
             )
-        # Check if path exists
-        if not path.exists() and command != "create":
+        # Check if path exists (a single stat also tells whether it is a directory)
+        try:
+            path_stat = os.stat(path)
+        except OSError:
+            path_stat = None
+        if path_stat is None and command != "create":
             raise ValueError(
                 f"The path {path} does not exist. Please provide a valid path."
             )
-        if path.exists() and command == "create":
+        if path_stat is not None and command == "create":
             raise ValueError(
                 f"File already exists at: {path}. Cannot overwrite files using command `create`."
             )
         # Check if the path points to a directory
-        if path.is_dir():
+        if path_stat is not None and stat.S_ISDIR(path_stat.st_mode):
             if command != "view":
                 raise ValueError(
                     f"The path {path} is a directory and only the `view` command can be used on directories"
@@ -164,20 +344,9 @@ Notes for using the `str_replace` command:
             if view_range:
                 return "Error: The `view_range` parameter is not allowed when `path` points to a directory."
 
-            # List files and directories up to 2 levels deep
-            files_and_dirs = []
-            for root, dirs, files in os.walk(path):
-                level = root.replace(str(path), '').count(os.sep)
-                if level <= 2:
-                    for file in files:
-                        if not file.startswith('.'):
-                            files_and_dirs.append(os.path.join(root, file))
-                    for dir in dirs:
-                        if not dir.startswith('.'):
-                            files_and_dirs.append(os.path.join(root, dir) + '/')
-                if level == 2:
-                    dirs[:] = []  # Don't go deeper than 2 levels
-            
+            # List files and directories up to 2 levels deep, off the event loop
+            files_and_dirs = await run_file_io(list, _walk_visible(str(path)))
+
             output = f"Here's the files and directories up to 2 levels deep in {path}, excluding hidden items:\n"
             output += "\n".join(files_and_dirs)
             return output
@@ -188,8 +357,7 @@ Notes for using the `str_replace` command:
             if len(view_range) != 2 or not all(isinstance(i, int) for i in view_range):
                 return "Error: Invalid `view_range`. It should be a list of two integers."
             
-            file_lines = file_content.split("\n")
-            n_lines_file = len(file_lines)
+            n_lines_file = file_content.count("\n") + 1
             init_line, final_line = view_range
             
             if init_line < 1 or init_line > n_lines_file:
@@ -201,49 +369,49 @@ Notes for using the `str_replace` command:
             if final_line != -1 and final_line < init_line:
                 return f"Error: Invalid `view_range`: {view_range}. Its second element `{final_line}` should be larger or equal than its first `{init_line}`"
 
+            # slice the range out by its offsets rather than splitting the whole file into lines
+            start = _skip_lines(file_content, init_line - 1)
             if final_line == -1:
-                file_content = "\n".join(file_lines[init_line - 1:])
+                file_content = file_content[start:]
             else:
-                file_content = "\n".join(file_lines[init_line - 1:final_line])
+                file_content = file_content[start:_skip_lines(file_content, final_line - init_line + 1, start) - 1]
 
         return self._make_output(file_content, str(path), init_line=init_line)
 
     async def str_replace(self, path: Path, old_str: str, new_str: Optional[str]) -> str:
         """Implement the str_replace command, which replaces old_str with new_str in the file content"""
         # Read the file content
-        file_content = (await self.read_file(path)).expandtabs()
-        old_str = old_str.expandtabs()
-        new_str = new_str.expandtabs() if new_str is not None else ""
-
-        # Check if old_str is unique in the file
-        occurrences = file_content.count(old_str)
-        if occurrences == 0:
+        raw_content = await self.read_file(path)
+        file_content = _expand_tabs(raw_content)
+        old_str = _expand_tabs(old_str)
+        new_str = _expand_tabs(new_str) if new_str is not None else ""
+
+        # Check if old_str is unique in the file, stopping at its second occurrence.
+        # str.find is already a two-way/memchr search: neither re nor bytes would scan less
+        first = file_content.find(old_str)
+        if first == -1:
             return f"Error: No replacement was performed, old_str `{old_str}` did not appear verbatim in {path}."
-        elif occurrences > 1:
-            file_content_lines = file_content.split("\n")
-            lines = [
-                idx + 1
-                for idx, line in enumerate(file_content_lines)
-                if old_str in line
-            ]
+        if file_content.find(old_str, first + len(old_str)) != -1:
+            lines = _occurrence_lines(file_content, old_str, first)
             return f"Error: No replacement was performed. Multiple occurrences of old_str `{old_str}` in lines {lines}. Please ensure it is unique"
 
-        # Replace old_str with new_str
-        new_file_content = file_content.replace(old_str, new_str)
+        if new_str == old_str and file_content is raw_content:
+            # nothing changes (not even tabs being expanded): skip rebuilding and rewriting the file
+            new_file_content = file_content
+        else:
+            # Replace old_str with new_str
+            new_file_content = file_content[:first] + new_str + file_content[first + len(old_str):]
 
-        # Write the new content to the file
-        await self.write_file(path, new_file_content)
+            # Write the new content to the file
+            await self.write_file(path, new_file_content)
 
         # Save the content to history
-        if path not in self._file_history:
-            self._file_history[path] = []
-        self._file_history[path].append(file_content)
+        self._file_history[os.fspath(path)].append(file_content)
 
-        # Create a snippet of the edited section
-        replacement_line = file_content.split(old_str)[0].count("\n")
+        # Create a snippet of the edited section, slicing around the edit instead of splitting the file
+        replacement_line = file_content.count("\n", 0, first)
         start_line = max(0, replacement_line - SNIPPET_LINES)
-        end_line = replacement_line + SNIPPET_LINES + new_str.count("\n")
-        snippet = "\n".join(new_file_content.split("\n")[start_line:end_line + 1])
+        snippet = _line_window(new_file_content, first, SNIPPET_LINES, SNIPPET_LINES + new_str.count("\n"))
 
         # Prepare the success message
         success_msg = f"The file {path} has been edited. "
@@ -256,33 +424,25 @@ Notes for using the `str_replace` command:
 
     async def insert(self, path: Path, insert_line: int, new_str: str) -> str:
         """Implement the insert command, which inserts new_str at the specified line in the file content."""
-        file_text = (await self.read_file(path)).expandtabs()
-        new_str = new_str.expandtabs()
-        file_text_lines = file_text.split("\n")
-        n_lines_file = len(file_text_lines)
+        file_text = _expand_tabs(await self.read_file(path))
+        new_str = _expand_tabs(new_str)
+        n_lines_file = file_text.count("\n") + 1
 
         if insert_line < 0 or insert_line > n_lines_file:
             return f"Error: Invalid `insert_line` parameter: {insert_line}. It should be within the range of lines of the file: {[0, n_lines_file]}"
 
-        new_str_lines = new_str.split("\n")
-        new_file_text_lines = (
-            file_text_lines[:insert_line]
-            + new_str_lines
-            + file_text_lines[insert_line:]
-        )
-        snippet_lines = (
-            file_text_lines[max(0, insert_line - SNIPPET_LINES):insert_line]
-            + new_str_lines
-            + file_text_lines[insert_line:insert_line + SNIPPET_LINES]
-        )
-
-        new_file_text = "\n".join(new_file_text_lines)
-        snippet = "\n".join(snippet_lines)
+        # splice new_str in at the start of line `insert_line`, or after the last line,
+        # and cut the snippet around it, without splitting the file into lines
+        if insert_line < n_lines_file:
+            offset = _skip_lines(file_text, insert_line)
+            new_file_text = file_text[:offset] + new_str + "\n" + file_text[offset:]
+        else:
+            offset = len(file_text) + 1
+            new_file_text = file_text + "\n" + new_str
+        snippet = _line_window(new_file_text, offset, SNIPPET_LINES, new_str.count("\n") + SNIPPET_LINES)
 
         await self.write_file(path, new_file_text)
-        if path not in self._file_history:
-            self._file_history[path] = []
-        self._file_history[path].append(file_text)
+        self._file_history[os.fspath(path)].append(file_text)
 
         success_msg = f"The file {path} has been edited. "
         success_msg += self._make_output(
@@ -295,34 +455,50 @@ Notes for using the `str_replace` command:
 
     async def undo_edit(self, path: Path) -> str:
         """Implement the undo_edit command."""
-        if path not in self._file_history or not self._file_history[path]:
+        history = self._file_history.get(os.fspath(path))
+        if not history:
             return f"Error: No edit history found for {path}."
 
-        old_text = self._file_history[path].pop()
+        old_text = history.pop()
         await self.write_file(path, old_text)
 
         return f"Last edit to {path} undone successfully. {self._make_output(old_text, str(path))}"
 
     async def read_file(self, path: Path) -> str:
-        """Read the content of a file from a given path."""
+        """Read the content of a file from a given path.
+
+        Served from memory when the file is unchanged since this tool last read or wrote it.
+        """
         try:
-            async with aiofiles.open(path, 'r', encoding="utf-8") as file:
-                return await file.read()
+            signature = _file_signature(path)
+            key = os.fspath(path)
+            cached = self._content_cache.get(key)
+            if cached is not None and cached[0] == signature:
+                self._content_cache.move_to_end(key)
+                return cached[1]
+            # one thread hop for open + read, instead of one per call with aiofiles
+            content = await run_file_io(_sync_read, path)
         except Exception as e:
             raise ValueError(f"Ran into {e} while trying to read {path}")
+        self._remember_content(path, signature, content)
+        return content
 
     async def write_file(self, path: Path, content: str) -> None:
         """Write the content of a file to a given path."""
         try:
-            # Ensure the directory exists
-            directory = os.path.dirname(path)
-            if directory and not os.path.exists(directory):
-                os.makedirs(directory)
-                
-            async with aiofiles.open(path, 'w', encoding="utf-8") as file:
-                await file.write(content)
+            await run_file_io(_sync_write, path, content)
+            signature = _file_signature(path)
         except Exception as e:
+            self._content_cache.pop(os.fspath(path), None)
             raise ValueError(f"Ran into {e} while trying to write to {path}")
+        self._remember_content(path, signature, content)
+
+    def _remember_content(self, path: Path, signature: Tuple[int, int], content: str) -> None:
+        key = os.fspath(path)
+        self._content_cache[key] = (signature, content)
+        self._content_cache.move_to_end(key)
+        if len(self._content_cache) > CONTENT_CACHE_SIZE:
+            self._content_cache.popitem(last=False)
 
     def maybe_truncate(self, content: str, truncate_after: Optional[int] = MAX_RESPONSE_LEN) -> str:
         """Truncate content and append a notice if content exceeds the specified length."""
@@ -342,15 +518,30 @@ Notes for using the `str_replace` command:
         """Generate output based on the content of a file."""
         file_content = self.maybe_truncate(file_content)
         if expand_tabs:
-            file_content = file_content.expandtabs()
-        file_content = "\n".join(
-            [
-                f"{i + init_line:6}\t{line}"
-                for i, line in enumerate(file_content.split("\n"))
-            ]
-        )
-        return (
-            f"Here's the result of running `cat -n` on {file_descriptor}:\n"
-            + file_content
-            + "\n"
-        )
+            file_content = _expand_tabs(file_content)
+        # number the lines straight into one buffer, without a list of formatted lines
+        output = io.StringIO()
+        output.write(f"Here's the result of running `cat -n` on {file_descriptor}:\n")
+        for i, line in enumerate(file_content.split("\n"), init_line):
+            output.write(f"{i:6}\t")
+            output.write(line)
+            output.write("\n")
+        return output.getvalue()
+
+
+_default_file_editor_tool: Optional[FileEditorTool] = None
+
+
+def get_default_file_editor_tool(shared_cache: Optional[ToolCallCache] = None) -> FileEditorTool:
+    """Return the process-wide FileEditorTool, creating it on first use.
+
+    Sharing it also shares the edit history, so `undo_edit` works across agents.
+    Each call sets its cache to `shared_cache` (None disables caching).
+    """
+    global _default_file_editor_tool
+    if _default_file_editor_tool is None:
+        _default_file_editor_tool = FileEditorTool(shared_cache=shared_cache)
+    else:
+        # the tool is shared, so it uses the cache of the agents created last
+        _default_file_editor_tool._cache = shared_cache
+    return _default_file_editor_tool
@@ -1,7 +1,16 @@
 from typing import Optional
 from smolagents import Tool
-import os
-import aiofiles
+
+from .file_editor import _open_for_write, run_file_io
+
+# the content is text, so only the text modes that write are accepted
+_VALID_MODES = frozenset({"w", "a", "x"})
+
+
+def _save(file_path: str, content: str, mode: str) -> None:
+    with _open_for_write(file_path, mode) as file:
+        file.write(content)
+
 
 class FileServerTool(Tool):
     name = "file_server"
@@ -33,15 +42,13 @@ The tool accepts content and a file path, and saves the content to that location
     output_type = "string"
 
     async def forward(self, file_path: str, content: str, mode: Optional[str] = "w") -> str:
+        mode = mode or "w"
+        if mode not in _VALID_MODES:
+            # fail before touching the filesystem, e.g. without creating the directory
+            return f"Error saving file: invalid mode {mode!r}. Use 'w' to write or 'a' to append."
         try:
-            # Ensure the directory exists
-            directory = os.path.dirname(file_path)
-            if directory and not os.path.exists(directory):
-                os.makedirs(directory)
-
-            # Write directly to the file
-            async with aiofiles.open(file_path, mode, encoding="utf-8") as file:
-                await file.write(content)
+            # create the directory and write the file in a single thread hop
+            await run_file_io(_save, file_path, content, mode)
 
             return f"Content successfully saved to {file_path}"
         except Exception as e:
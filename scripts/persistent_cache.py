@@ -0,0 +1,92 @@
+import hashlib
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Any, Optional, Union
+
+from .tool_cache import _MISSING, ToolCallCache
+
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "smolagents_manus" / "tool_cache"
+
+
+def _config_hash(env_file: Union[str, Path]) -> str:
+    """Hash the .env file so that changing the configuration invalidates cached results."""
+    try:
+        return hashlib.sha256(Path(env_file).read_bytes()).hexdigest()
+    except OSError:
+        return ""
+
+
+class PersistentToolCache(ToolCallCache):
+    """A ToolCallCache stored in SQLite, so cached results survive across runs of the agent.
+
+    Keys additionally include the platform and a hash of the `.env` file.
+    Values must be JSON-serializable (the bash and file editor results are);
+    other values are simply not cached.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Union[str, Path]] = None,
+        maxsize: int = 1024,
+        ttl: float = 300.0,
+        env_file: Union[str, Path] = ".env",
+    ):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        path = Path(path) if path is not None else DEFAULT_CACHE_DIR / "cache.sqlite"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._config_hash = _config_hash(env_file)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, tag TEXT, expires_at REAL, last_used REAL, value TEXT)"
+            )
+
+    def make_key(self, tool_name: str, *parts: Any) -> str:
+        return super().make_key(tool_name, *parts, sys.platform, self._config_hash)
+
+    def get(self, key: str) -> Any:
+        now = time.time()
+        with self._lock, self._db:
+            row = self._db.execute("SELECT expires_at, value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or row[0] < now:
+                if row is not None:
+                    self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self.misses += 1
+                return _MISSING
+            self._db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return json.loads(row[1])
+
+    def set(self, key: str, value: Any, tag: Optional[str] = None) -> None:
+        try:
+            serialized = json.dumps(value)
+        except (TypeError, ValueError):
+            return
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, tag, expires_at, last_used, value) VALUES (?, ?, ?, ?, ?)",
+                (key, tag, now + self.ttl, now, serialized),
+            )
+            self._db.execute("DELETE FROM entries WHERE expires_at < ?", (now,))
+            self._db.execute(
+                "DELETE FROM entries WHERE key NOT IN (SELECT key FROM entries ORDER BY last_used DESC LIMIT ?)",
+                (self.maxsize,),
+            )
+
+    def invalidate(self, tag: Optional[str] = None) -> None:
+        with self._lock, self._db:
+            if tag is None:
+                self._db.execute("DELETE FROM entries")
+                return
+            stale = [
+                (key,)
+                for key, entry_tag in self._db.execute("SELECT key, tag FROM entries")
+                if entry_tag is None or entry_tag.startswith(tag) or tag.startswith(entry_tag)
+            ]
+            self._db.executemany("DELETE FROM entries WHERE key = ?", stale)
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Iterable, List, Optional, Tuple, Union
+
+
+DEFAULT_PLAN_CACHE_PATH = Path.home() / ".cache" / "smolagents_manus" / "plans.sqlite"
+
+_STOPWORDS = frozenset(
+    "a an and are as at be by can could did do does for from has have how i in is it its me my "
+    "of on or please should tell that the their there this to was what when where which who why "
+    "will with would you your".split()
+)
+# concrete entities of a question: quoted text, numbers, and capitalized words after the first one
+_ENTITY_PATTERN = re.compile(r"\"[^\"]+\"|'[^']+'|\d+(?:[.,]\d+)*|(?<!^)(?<![.?!]\s)\b[A-Z][\w-]*")
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def extract_entities(question: str) -> List[str]:
+    """Return the concrete entities of `question` (quoted text, numbers, proper nouns), in order."""
+    return _ENTITY_PATTERN.findall(question.strip())
+
+
+def extract_keywords(question: str) -> Tuple[str, ...]:
+    """Return the sorted intent keywords of `question`, i.e. its words minus stopwords and entities."""
+    without_entities = _ENTITY_PATTERN.sub(" ", question.strip())
+    words = {word.lower() for word in _WORD_PATTERN.findall(without_entities)}
+    return tuple(sorted(words - _STOPWORDS))
+
+
+def _fill_template(plan: str, cached_entities: List[str], entities: List[str]) -> Optional[str]:
+    """Replace the entities of the cached question with those of the new one.
+
+    Returns None when they do not line up one to one, or when an entity that
+    differs does not appear verbatim in the plan: the plan would then still
+    refer to the specifics of the cached question.
+    """
+    if len(cached_entities) != len(entities):
+        return None
+    replacements = {old: new for old, new in zip(cached_entities, entities) if old != new}
+    if not replacements:
+        return plan
+    if any(old not in plan for old in replacements):
+        return None
+    pattern = re.compile("|".join(re.escape(old) for old in sorted(replacements, key=len, reverse=True)))
+    return pattern.sub(lambda match: replacements[match.group(0)], plan)
+
+
+class PlanCache:
+    """Caches the initial plan of the manager agent in SQLite, keyed by the intent of the question.
+
+    Questions that only differ in their specifics (names, numbers, quoted text)
+    share a key; on a hit the cached plan is adapted by substituting the new
+    specifics and handed to the agent as a starting point, so it can skip
+    re-deriving the same strategy. Entries expire after `ttl` seconds and are
+    keyed by `config` too (e.g. the authorized imports), so changing it
+    invalidates them.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Union[str, Path]] = None,
+        ttl: float = 24 * 3600.0,
+        config: Iterable[Any] = (),
+    ):
+        path = Path(path) if path is not None else DEFAULT_PLAN_CACHE_PATH
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._config_hash = hashlib.sha256(json.dumps(list(config), default=str).encode()).hexdigest()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS plans (key TEXT PRIMARY KEY, created_at REAL, entities TEXT, plan TEXT)"
+            )
+
+    def make_key(self, question: str) -> str:
+        payload = json.dumps([extract_keywords(question), self._config_hash])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, question: str) -> Optional[str]:
+        """Return the cached plan adapted to `question`, or None."""
+        key = self.make_key(question)
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM plans WHERE created_at < ?", (time.time() - self.ttl,))
+            row = self._db.execute("SELECT entities, plan FROM plans WHERE key = ?", (key,)).fetchone()
+            plan = None
+            if row is not None:
+                plan = _fill_template(row[1], json.loads(row[0]), extract_entities(question))
+            # a plan that cannot be adapted to the question counts as a miss
+            if plan is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return plan
+
+    def set(self, question: str, plan: str) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO plans (key, created_at, entities, plan) VALUES (?, ?, ?, ?)",
+                (self.make_key(question), time.time(), json.dumps(extract_entities(question)), plan),
+            )
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+    def run(self, agent, question: str) -> Any:
+        """Run `agent` on `question`, seeding it with a cached plan and caching its first plan."""
+        plan = self.get(question)
+        task = question
+        if plan is not None:
+            task += (
+                "\n\nA plan that worked for a similar task is given below. "
+                "Adapt it to this task rather than planning from scratch:\n" + plan
+            )
+        answer = agent.run(task)
+        if plan is None:
+            first_plan = next(
+                (step.plan for step in agent.memory.steps if getattr(step, "plan", None)),
+                None,
+            )
+            if first_plan:
+                self.set(question, first_plan)
+        return answer
@@ -0,0 +1,75 @@
+"""Replay a representative browser trace, to profile BrowserManager on real pages.
+
+Run it from the repository root under Scalene to attribute wall time to
+individual `await` lines (time waiting on CDP vs. time spent in Python):
+
+    PYTHONPATH=. scalene --async --cli scripts/profile_browser.py -- --rounds 5
+
+Without a profiler it prints the wall time of each operation.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from collections import defaultdict
+from typing import Awaitable, Callable, DefaultDict, List
+
+from scripts.browser_use_tool import BrowserManager
+
+
+DEFAULT_URLS = [
+    "https://example.com",
+    "https://en.wikipedia.org/wiki/Python_(programming_language)",
+    "https://news.ycombinator.com",
+]
+
+
+async def _timed(timings: DefaultDict[str, List[float]], name: str, call: Callable[[], Awaitable]):
+    start = time.perf_counter()
+    result = await call()
+    timings[name].append(time.perf_counter() - start)
+    return result
+
+
+async def replay(urls: List[str], rounds: int, headless: bool) -> DefaultDict[str, List[float]]:
+    """Navigate, read, inspect, click and scroll on each URL, `rounds` times."""
+    timings: DefaultDict[str, List[float]] = defaultdict(list)
+    manager = BrowserManager(headless=headless)
+    try:
+        for _ in range(rounds):
+            for url in urls:
+                await _timed(timings, "navigate", lambda: manager.navigate(url, return_text=False))
+                await _timed(timings, "get_text", manager.get_text)
+                await _timed(timings, "get_text (repeated)", manager.get_text)
+                await _timed(timings, "get_html", manager.get_html)
+                await _timed(timings, "get_state", manager.get_state)
+                await _timed(timings, "scroll", lambda: manager.scroll(500))
+                await _timed(timings, "screenshot", manager.screenshot)
+                # click the first interactive element, if the page has one
+                if manager._selector_map and manager._selector_map[1]:
+                    index = min(manager._selector_map[1])
+                    await _timed(timings, "click", lambda: manager.click(index))
+        await _timed(timings, "navigate_many", lambda: manager.navigate_many(urls))
+    finally:
+        await manager.cleanup()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("urls", nargs="*", default=DEFAULT_URLS)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--headed", action="store_true", help="Show the browser window.")
+    args = parser.parse_args()
+
+    timings = asyncio.run(replay(args.urls, args.rounds, headless=not args.headed))
+    print(f"{'operation':<22}{'calls':>6}{'median ms':>12}{'max ms':>10}")
+    for name, durations in timings.items():
+        print(
+            f"{name:<22}{len(durations):>6}"
+            f"{statistics.median(durations) * 1000:>12.1f}{max(durations) * 1000:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+from smolagents import LiteLLMModel
+
+
+_CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def _supports_cache_control(model_id: str) -> bool:
+    """Anthropic models only cache prompt prefixes that are explicitly marked with `cache_control`."""
+    model_id = model_id.lower()
+    return "claude" in model_id or model_id.startswith("anthropic/")
+
+
+# marked system messages, keyed by a hash of their content, shared by every agent with the same static prompt.
+# an LRU, since a system prompt that embeds e.g. the task changes with every run
+_STATIC_PREFIX_CACHE: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_STATIC_PREFIX_CACHE_SIZE = 32
+# agents may run in threads
+_STATIC_PREFIX_LOCK = threading.Lock()
+
+
+def _static_prefix_key(message: Dict[str, Any]) -> str:
+    content = message.get("content")
+    if not isinstance(content, str):
+        content = json.dumps(content, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def _mark_static_prefix(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Return a copy of `messages` whose leading system block ends with a cache breakpoint.
+
+    The marked message is built once per distinct system prompt and reused on
+    later steps instead of being rebuilt every call.
+    """
+    n_system = 0
+    while n_system < len(messages) and messages[n_system].get("role") == "system":
+        n_system += 1
+    if n_system == 0:
+        return messages
+
+    key = _static_prefix_key(messages[n_system - 1])
+    with _STATIC_PREFIX_LOCK:
+        last_system = _STATIC_PREFIX_CACHE.get(key)
+        if last_system is not None:
+            _STATIC_PREFIX_CACHE.move_to_end(key)
+    if last_system is None:
+        last_system = dict(messages[n_system - 1])
+        content = last_system.get("content")
+        if isinstance(content, str):
+            content = [{"type": "text", "text": content}]
+        if not content:
+            return messages
+        content = list(content)
+        content[-1] = {**content[-1], "cache_control": _CACHE_CONTROL}
+        last_system["content"] = content
+        with _STATIC_PREFIX_LOCK:
+            _STATIC_PREFIX_CACHE[key] = last_system
+            while len(_STATIC_PREFIX_CACHE) > _STATIC_PREFIX_CACHE_SIZE:
+                _STATIC_PREFIX_CACHE.popitem(last=False)
+
+    messages = list(messages)
+    messages[n_system - 1] = last_system
+    return messages
+
+
+class PromptCachingLiteLLMModel(LiteLLMModel):
+    """LiteLLMModel that lets the provider cache the static system prompt across calls.
+
+    The system prompt (instructions + tool descriptions) is identical for every
+    step of an agent run. For Anthropic models it is marked with
+    `cache_control` so later calls read it from the prompt cache; OpenAI caches
+    stable prefixes automatically, so messages for other providers are sent
+    unchanged. In both cases the prefix has to stay byte-identical, which is why
+    the agent prompts are only extended once, at construction time.
+    """
+
+    def _prepare_completion_kwargs(self, *args, **kwargs) -> Dict[str, Any]:
+        completion_kwargs = super()._prepare_completion_kwargs(*args, **kwargs)
+        if _supports_cache_control(self.model_id) and completion_kwargs.get("messages"):
+            completion_kwargs["messages"] = _mark_static_prefix(completion_kwargs["messages"])
+        return completion_kwargs
@@ -0,0 +1,207 @@
+import copy
+import functools
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+
+_MISSING = object()
+
+
+class ToolCallCache:
+    """An LRU cache with TTL for tool results, keyed by a SHA-256 of the tool call.
+
+    Entries can carry a tag (e.g. a file path). `invalidate(tag)` drops every
+    untagged entry plus the tagged entries whose tag is a prefix of `tag` or
+    vice versa, so one instance can be shared by several tools and agents.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def make_key(self, tool_name: str, *parts: Any) -> str:
+        payload = json.dumps([tool_name, *parts], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> Any:
+        """Return the cached value, or `_MISSING` if absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return _MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.copy(entry[2])
+
+    def set(self, key: str, value: Any, tag: Optional[str] = None) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, tag, copy.copy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, tag: Optional[str] = None) -> None:
+        """Drop entries that a mutation of `tag` may have made stale (all entries if `tag` is None)."""
+        with self._lock:
+            if tag is None:
+                self._entries.clear()
+                return
+            stale = [
+                key
+                for key, (_, entry_tag, _) in self._entries.items()
+                if entry_tag is None or entry_tag.startswith(tag) or tag.startswith(entry_tag)
+            ]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        self.invalidate(None)
+
+
+def _is_failure(result: Any) -> bool:
+    """Whether a tool result reports a failure.
+
+    Failures are not cached: they are often transient (a file not created yet, a
+    restarted shell) and the next call should try again. Covers the results of the
+    bash tool (`system` notices, output on stderr, non-zero exit codes) and the
+    `"Error: ..."` strings of the other tools.
+    """
+    if isinstance(result, dict):
+        return "system" in result or bool(result.get("error")) or bool(result.get("exit_code"))
+    return isinstance(result, str) and result.startswith("Error:")
+
+
+def cache_if(
+    tool_name: str,
+    cacheable: Callable[..., bool],
+    key_parts: Optional[Callable[..., tuple]] = None,
+    tag: Optional[Callable[..., Optional[str]]] = None,
+    bypass: Optional[Callable[..., bool]] = None,
+):
+    """Cache the results of an async `forward` in `self._cache` when `cacheable(*args, **kwargs)` is true.
+
+    Calls that are not cacheable are treated as mutations and invalidate the
+    cache (scoped by `tag` if given). Cacheable calls for which `bypass` is true
+    run uncached without invalidating anything. Failed results (see `_is_failure`)
+    are returned but not cached. `key_parts` and `bypass` are
+    called with the tool as first argument, since they may depend on its state
+    (e.g. the bash session). Tools without a `_cache` are unaffected.
+    """
+
+    def decorator(forward):
+        @functools.wraps(forward)
+        async def wrapper(self, *args, **kwargs):
+            cache: Optional[ToolCallCache] = getattr(self, "_cache", None)
+            if cache is None:
+                return await forward(self, *args, **kwargs)
+
+            entry_tag = tag(*args, **kwargs) if tag else None
+            if not cacheable(*args, **kwargs):
+                try:
+                    return await forward(self, *args, **kwargs)
+                finally:
+                    cache.invalidate(entry_tag)
+
+            if bypass is not None and bypass(self, *args, **kwargs):
+                return await forward(self, *args, **kwargs)
+
+            extra = key_parts(self, *args, **kwargs) if key_parts else ()
+            key = cache.make_key(tool_name, args, kwargs, *extra)
+            result = cache.get(key)
+            if result is _MISSING:
+                result = await forward(self, *args, **kwargs)
+                if not _is_failure(result):
+                    cache.set(key, result, tag=entry_tag)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+# Programs whose invocation only reads state. Anything else is treated as mutating.
+_READ_ONLY_COMMANDS = frozenset(
+    {
+        "ls", "cat", "head", "wc", "pwd", "grep", "egrep", "fgrep", "rg", "find", "tree",
+        "file", "stat", "du", "df", "which", "whoami", "uname", "echo", "diff", "sort", "uniq",
+    }
+)
+_READ_ONLY_GIT_SUBCOMMANDS = frozenset({"status", "log", "diff", "show", "ls-files", "rev-parse", "blame"})
+_UNSAFE_SHELL_SYNTAX = re.compile(r"[<>`&]|\$\(")
+_COMMAND_SEPARATORS = re.compile(r"\|\||&&|[;|\n]")
+
+
+def _is_mutating(command: str) -> bool:
+    """Conservatively decide whether a shell command may change state (or observe changing state).
+
+    Redirections, command substitution, background jobs, options that write
+    files (e.g. `sort -o`, `find -fprint`, `--output=`) and any program outside
+    a small read-only allowlist (e.g. `rm`, `mv`, `cd`, `pip install`,
+    `git commit`, `sed -i`) all count as mutating.
+    """
+    if not command.strip() or _UNSAFE_SHELL_SYNTAX.search(command):
+        return True
+    for segment in _COMMAND_SEPARATORS.split(command):
+        words = segment.split()
+        if not words:
+            continue
+        if words[0] == "git":
+            if len(words) < 2 or words[1] not in _READ_ONLY_GIT_SUBCOMMANDS:
+                return True
+        elif words[0] not in _READ_ONLY_COMMANDS:
+            return True
+        elif words[0] == "find" and any(
+            w in ("-delete", "-exec", "-execdir", "-ok", "-okdir", "-fls") or w.startswith("-fprint") for w in words
+        ):
+            return True
+        elif words[0] in ("sort", "tree") and any(
+            w.startswith("-") and not w.startswith("--") and "o" in w for w in words[1:]
+        ):
+            # `-o FILE` writes the output to a file
+            return True
+        elif words[0] == "uniq" and len([w for w in words[1:] if not w.startswith("-")]) > 1:
+            # `uniq INPUT OUTPUT` writes to OUTPUT
+            return True
+        if any(w.startswith("--output") for w in words):
+            # e.g. `git diff --output=FILE`, `sort --output=FILE`
+            return True
+    return False
+
+
+# Builtins that change the state of the shell itself (directory, variables, options, ...).
+_SHELL_STATE_BUILTINS = frozenset(
+    {
+        "cd", "pushd", "popd", "export", "unset", "source", "alias", "unalias", "set", "shopt",
+        "eval", "exec", "umask", "declare", "typeset", "readonly", "local", "hash", "ulimit", "trap",
+    }
+)
+_SHELL_WORD_SEPARATORS = re.compile(r"[\s;|&(){}]+")
+_ASSIGNMENT = re.compile(r"[A-Za-z_]\w*=")
+
+
+def _changes_shell_state(command: str) -> bool:
+    """Conservatively decide whether a command may change the state of the shell running it.
+
+    After such a command (e.g. `cd`, `export`, `source`, `FOO=1`) the session's
+    output can differ from a fresh shell's, so it must not share cached results.
+    Any word that looks like a state builtin or a variable assignment counts,
+    and so does `.` (i.e. `source`) at the start of a command.
+    """
+    if any(segment.split()[:1] == ["."] for segment in _COMMAND_SEPARATORS.split(command)):
+        return True
+    return any(
+        word in _SHELL_STATE_BUILTINS or _ASSIGNMENT.match(word)
+        for word in _SHELL_WORD_SEPARATORS.split(command)
+    )
@@ -0,0 +1,21 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("smolagents")
+
+from scripts.bash_tool import BashTool
+
+
+def test_closing_a_stream_early_interrupts_the_command():
+    tool = BashTool()
+
+    async def run():
+        stream = tool.forward_stream("echo started; sleep 30; echo finished")
+        async for event in stream:
+            assert event == {"delta": "started\n", "stream": "output"}
+            break
+        await stream.aclose()
+        return await asyncio.wait_for(tool.forward("echo next"), 5)
+
+    assert asyncio.run(run()) == {"output": "next", "error": ""}
@@ -0,0 +1,107 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+for module in ("smolagents", "browser_use", "playwright", "aiofiles"):
+    pytest.importorskip(module)
+
+from scripts.browser_use_tool import BrowserGetTextTool, BrowserManager
+
+
+class FakePage:
+    def __init__(self, text):
+        self.text = text
+        self.url = f"https://example.com/{text}"
+        self.closed = False
+
+    def is_closed(self):
+        return self.closed
+
+    async def evaluate(self, script):
+        if "__manusDomVersion" in script:
+            return [self.text, self.text]
+        if script.startswith("({url"):
+            return {"url": self.url, "text": self.text}
+        return self.text
+
+
+class FakeContext:
+    """Mimics browser-use's context: the active page is the last page of the session."""
+
+    def __init__(self):
+        self.session = SimpleNamespace(context=SimpleNamespace(pages=[FakePage("first")]))
+
+    async def get_session(self):
+        return self.session
+
+    async def get_current_page(self):
+        return self.session.context.pages[-1]
+
+    async def get_selector_map(self):
+        return {1: SimpleNamespace(xpath="html/body/a")}
+
+    async def _click_element_node(self, element):
+        # the link has target="_blank"
+        self.session.context.pages.append(FakePage("second"))
+
+
+def _manager(context):
+    manager = BrowserManager(headless=True, browser=object())
+    manager.context = context
+    return manager
+
+
+def test_click_that_opens_a_tab_moves_reads_to_the_new_tab():
+    manager = _manager(FakeContext())
+
+    async def run():
+        assert await manager.get_text() == "first"
+        await manager.click(1)
+        return await manager.get_text()
+
+    assert asyncio.run(run()) == "second"
+
+
+def test_click_and_read_reads_the_tab_opened_by_the_click():
+    manager = _manager(FakeContext())
+
+    result = asyncio.run(manager.click_and_read(1))
+
+    assert result == {"url": "https://example.com/second", "text": "second"}
+    assert manager.current_url == "https://example.com/second"
+
+
+def test_closed_page_is_not_reused():
+    context = FakeContext()
+    manager = _manager(context)
+
+    async def run():
+        await manager.get_text()
+        pages = context.session.context.pages
+        pages[0].closed = True
+        pages[:] = [FakePage("other")]
+        return await manager.get_text()
+
+    assert asyncio.run(run()) == "other"
+
+
+def test_click_on_an_unknown_index_is_reported():
+    manager = _manager(FakeContext())
+
+    assert asyncio.run(manager.click(99)) == "Error: Element with index 99 not found"
+
+
+def test_unchanged_text_is_tracked_per_tool():
+    manager = _manager(FakeContext())
+    first, second = BrowserGetTextTool(manager), BrowserGetTextTool(manager)
+
+    async def run():
+        return [await first.forward(), await second.forward(), await first.forward()]
+
+    results = asyncio.run(run())
+    assert "first" in results[0] and "first" in results[1]
+    assert "unchanged" in results[2]
+
+    first.reset_observation()
+    assert "first" in asyncio.run(first.forward())
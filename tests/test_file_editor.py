@@ -0,0 +1,39 @@
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("smolagents")
+
+from scripts.file_editor import FileEditorTool  # noqa: E402
+
+
+def test_cached_view_sees_changes_made_outside_the_tool(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_text("old")
+    tool = FileEditorTool(use_cache=True)
+
+    assert "old" in asyncio.run(tool.forward("view", str(path)))
+    path.write_text("new content")
+    # keep the mtime from hiding the change on coarse-grained filesystems
+    os.utime(path, ns=(0, 0))
+    assert "new content" in asyncio.run(tool.forward("view", str(path)))
+
+
+def test_cached_directory_view_sees_nested_changes(tmp_path):
+    (tmp_path / "sub").mkdir()
+    tool = FileEditorTool(use_cache=True)
+
+    asyncio.run(tool.forward("view", str(tmp_path)))
+    (tmp_path / "sub" / "b.txt").write_text("x")
+    assert "b.txt" in asyncio.run(tool.forward("view", str(tmp_path)))
+
+
+def test_default_tool_uses_the_latest_shared_cache():
+    from scripts.file_editor import get_default_file_editor_tool
+    from scripts.tool_cache import ToolCallCache
+
+    first, second = ToolCallCache(), ToolCallCache()
+    assert get_default_file_editor_tool(shared_cache=first)._cache is first
+    assert get_default_file_editor_tool(shared_cache=second)._cache is second
+    assert get_default_file_editor_tool(shared_cache=None)._cache is None
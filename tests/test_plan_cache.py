@@ -0,0 +1,27 @@
+from scripts.plan_cache import PlanCache, _fill_template, extract_entities
+
+SOSA = "How many studio albums did Mercedes Sosa release before 2007?"
+SOSA_PLAN = "1. Search Mercedes Sosa discography\n2. Count the studio albums before 2007"
+ADELE = "How many studio albums did Adele release before 2020?"
+
+
+def test_fill_template_substitutes_matching_entities():
+    question = "How many studio albums did Adele Adkins release before 2020?"
+    plan = _fill_template(SOSA_PLAN, extract_entities(SOSA), extract_entities(question))
+    assert plan == "1. Search Adele Adkins discography\n2. Count the studio albums before 2020"
+
+
+def test_fill_template_rejects_mismatched_entities():
+    assert _fill_template(SOSA_PLAN, extract_entities(SOSA), extract_entities(ADELE)) is None
+
+
+def test_fill_template_rejects_entities_missing_from_the_plan():
+    assert _fill_template("1. Search the discography", ["Sosa"], ["Adele"]) is None
+
+
+def test_mismatched_question_is_a_miss(tmp_path):
+    cache = PlanCache(path=tmp_path / "plans.sqlite")
+    cache.set(SOSA, SOSA_PLAN)
+    assert cache.make_key(ADELE) == cache.make_key(SOSA)
+    assert cache.get(ADELE) is None
+    assert cache.stats()["misses"] == 1
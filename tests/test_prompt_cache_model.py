@@ -0,0 +1,14 @@
+import pytest
+
+pytest.importorskip("smolagents")
+
+from scripts import prompt_cache_model
+from scripts.prompt_cache_model import _mark_static_prefix
+
+
+def test_static_prefix_cache_is_bounded():
+    for i in range(prompt_cache_model._STATIC_PREFIX_CACHE_SIZE + 8):
+        messages = _mark_static_prefix([{"role": "system", "content": f"prompt {i}"}, {"role": "user", "content": "q"}])
+
+    assert len(prompt_cache_model._STATIC_PREFIX_CACHE) == prompt_cache_model._STATIC_PREFIX_CACHE_SIZE
+    assert messages[0]["content"][-1] == {"type": "text", "text": f"prompt {i}", "cache_control": {"type": "ephemeral"}}
@@ -0,0 +1,23 @@
+import importlib
+import sys
+
+import pytest
+
+for module in ("smolagents", "browser_use", "litellm", "httpx", "dotenv", "huggingface_hub"):
+    pytest.importorskip(module)
+
+
+def test_importing_run_does_not_create_a_browser_manager(monkeypatch):
+    import huggingface_hub
+    from scripts import browser_use_tool
+
+    monkeypatch.setattr(huggingface_hub, "login", lambda *args, **kwargs: None)
+    created = []
+    monkeypatch.setattr(
+        browser_use_tool.BrowserManager, "__init__", lambda self, *args, **kwargs: created.append(self)
+    )
+    monkeypatch.delitem(sys.modules, "run", raising=False)
+
+    importlib.import_module("run")
+
+    assert created == []
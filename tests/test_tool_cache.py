@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from scripts.tool_cache import ToolCallCache, _changes_shell_state, _is_mutating
+
+
+@pytest.mark.parametrize("command", ["ls -la", "cat a.txt | grep foo", "git status", "find . -name '*.py'", "sort -r a.txt", "uniq -c a.txt"])
+def test_read_only_commands_are_not_mutating(command):
+    assert not _is_mutating(command)
+
+
+@pytest.mark.parametrize(
+    "command",
+    [
+        "rm -rf build",
+        "ls > out.txt",
+        "cd /tmp",
+        "git commit -m x",
+        "echo $(date)",
+        "sort -o out.txt in.txt",
+        "sort -ro out.txt in.txt",
+        "uniq in.txt out.txt",
+        "find . -fprint out.txt",
+        "find . -fls out.txt",
+        "tree -o t.txt",
+        "git diff --output=p.diff",
+    ],
+)
+def test_mutating_commands(command):
+    assert _is_mutating(command)
+
+
+@pytest.mark.parametrize("command", ["cd /tmp", "export FOO=1", ". venv/bin/activate", "FOO=1", "{ cd x; }"])
+def test_commands_changing_shell_state(command):
+    assert _changes_shell_state(command)
+
+
+@pytest.mark.parametrize("command", ["ls", "grep -r foo .", "git diff --stat"])
+def test_commands_keeping_shell_state(command):
+    assert not _changes_shell_state(command)
+
+
+def test_bash_sessions_sharing_a_cache_do_not_see_each_others_directory(tmp_path):
+    pytest.importorskip("smolagents")
+    from scripts.bash_tool import BashTool
+
+    (tmp_path / "ONLY_IN_TMPDIR").touch()
+    cache = ToolCallCache()
+    first, second = BashTool(shared_cache=cache), BashTool(shared_cache=cache)
+
+    async def run():
+        await first.forward(f"cd {tmp_path}")
+        assert (await first.forward("ls"))["output"] == "ONLY_IN_TMPDIR"
+        return await second.forward("ls")
+
+    assert "ONLY_IN_TMPDIR" not in asyncio.run(run())["output"]
+
+
+def test_streamed_mutating_command_invalidates_the_cache(tmp_path):
+    pytest.importorskip("smolagents")
+    from scripts.bash_tool import BashTool
+
+    (tmp_path / "a.txt").touch()
+    tool = BashTool(use_cache=True)
+
+    async def run():
+        await tool.forward(f"ls {tmp_path}")
+        async for _ in tool.forward_stream(f"rm {tmp_path}/a.txt"):
+            pass
+        return await tool.forward(f"ls {tmp_path}")
+
+    assert asyncio.run(run())["output"] == ""
+
+
+def test_failed_bash_results_are_not_cached(tmp_path):
+    pytest.importorskip("smolagents")
+    from scripts.bash_tool import BashTool
+
+    tool = BashTool(use_cache=True)
+
+    async def run():
+        assert (await tool.forward(f"cat {tmp_path}/a.txt"))["error"]
+        (tmp_path / "a.txt").write_text("created later")
+        return await tool.forward(f"cat {tmp_path}/a.txt")
+
+    assert asyncio.run(run())["output"] == "created later"